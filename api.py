@@ -0,0 +1,280 @@
+"""Headless JSON API on the Flask server of the Dash app.
+
+POST /api/batch evaluates a batch of wall cases with the same formulas as
+update_graphs (solver.solve at depth h/2). The body is either a JSON object
+{"cases": [...]} or NDJSON with one case per line; NDJSON is read line by line
+so the server memory stays constant for any number of cases. Each case has the
+keys u_r, h, friction_angle, gamma_1, gamma_r_1 and water_table. Results are
+streamed back as NDJSON in the order of the cases.
+
+POST /api/layers returns the pressure profile and resultant of a layered soil,
+{"layers": [{"thickness", "gamma_d", "gamma_sat", "friction_angle"}, ...],
+"u_r", "water_table" (height above the base, default 0 for dry soil) and
+either "depths" or "num"}.
+
+POST /api/calibrate fits ϕ′, a_a and a_b of instrumented walls to measured
+pressures, see calibration.py. The measurements are a CSV upload (file field
+"file" or a text/csv body) with a header row of the measurement keys and an
+optional "wall" column, or JSON {"measurements": [...]}.
+
+POST /api/stages evaluates a staged excavation {"soil": {"friction_angle",
+"gamma_1", "gamma_r_1"}, "stages": [{"h", "water_table", "u_r"}, ...]}. Only
+the stages from the first edited one on are recomputed, see staging.py.
+
+GET /api/export streams a design table as CSV or xlsx (format=csv|xlsx, see
+export.py). The query parameters friction_angle, h, u_r, water_table,
+gamma_1 and gamma_r_1 take ranges like the sweep CLI, start:stop:step or
+comma separated values. Tables of more than export.MAX_ROWS rows are refused.
+
+POST /api/jobs queues a background job {"kind": "monte_carlo" | "sweep",
+"params": {...}} and returns its id, see jobs.py. GET /api/jobs/<id> returns
+its status and progress, GET /api/jobs/<id>/result its result once it is done
+and DELETE /api/jobs/<id> cancels it.
+"""
+import csv
+import io
+import itertools
+import json
+import math
+
+import numpy as np
+from flask import Blueprint, Response, request, stream_with_context
+
+import calibration
+import export
+import jobs
+import solver
+import staging
+import sweep
+import stratigraphy
+
+
+CASE_KEYS = ('u_r', 'h', 'friction_angle', 'gamma_1', 'gamma_r_1', 'water_table')
+RESULT_KEYS = ('k', 'k_0', 'k_a_ult', 'k_p_ult', 'sigma_v0', 'sigma_h', 'center', 'radius')
+STATE_NAMES = {-1: 'active', 0: 'at rest', 1: 'passive'}
+
+# Cases evaluated per vectorized solver call
+CHUNK_SIZE = 4096
+
+blueprint = Blueprint('api', __name__, url_prefix='/api')
+
+
+class BadCase(ValueError):
+    """Raised for cases that miss keys or have non-numeric or non-finite values."""
+
+
+def _case_values(case):
+    # Values of one case in the order of CASE_KEYS, BadCase instances are unreadable NDJSON lines
+    if isinstance(case, BadCase):
+        raise case
+    try:
+        values = [float(case[key]) for key in CASE_KEYS]
+    except (KeyError, TypeError, ValueError) as error:
+        raise BadCase(f'every case needs numeric values for {", ".join(CASE_KEYS)}') from error
+    if not all(math.isfinite(value) for value in values):
+        raise BadCase(f'the values of {", ".join(CASE_KEYS)} must be finite')
+    return values
+
+
+def _solve_rows(rows):
+    # One result dict per row of case values, evaluated in one vectorized call
+    columns = np.array(rows, dtype=float).reshape(-1, len(CASE_KEYS))
+    state = solver.solve(*columns.T)
+    shape = columns.shape[:1]
+    values = {key: np.broadcast_to(state[key], shape).tolist() for key in RESULT_KEYS}
+    states = np.broadcast_to(state['state'], shape).tolist()
+    return [dict({key: values[key][i] for key in RESULT_KEYS}, state=STATE_NAMES[states[i]])
+            for i in range(len(rows))]
+
+
+def solve_cases(cases):
+    """Return one result dict per case, evaluated in one vectorized call."""
+    return _solve_rows([_case_values(case) for case in cases])
+
+
+def chunks(iterable, size=CHUNK_SIZE):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_results(cases, chunk_size=CHUNK_SIZE):
+    """Yield the NDJSON lines of the results, an error line ends the stream.
+
+    The cases before an invalid one are all streamed, the error line gives the
+    index of the invalid case.
+    """
+    index = 0
+    for chunk in chunks(cases, chunk_size):
+        rows = []
+        error = None
+        for case in chunk:
+            try:
+                rows.append(_case_values(case))
+            except BadCase as bad_case:
+                error = bad_case
+                break
+        if rows:
+            for result in _solve_rows(rows):
+                yield json.dumps(result) + '\n'
+        if error is not None:
+            yield json.dumps({'error': str(error), 'case': index + len(rows)}) + '\n'
+            return
+        index += len(chunk)
+
+
+def _ndjson_cases(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                yield BadCase(f'invalid JSON line: {error}')
+
+
+@blueprint.route('/batch', methods=['POST'])
+def batch():
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        cases = _ndjson_cases(request.stream)
+    else:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get('cases'), list):
+            return {'error': 'expected {"cases": [...]} or an application/x-ndjson body'}, 400
+        cases = body['cases']
+    return Response(stream_with_context(stream_results(cases)), mimetype='application/x-ndjson')
+
+
+@blueprint.route('/layers', methods=['POST'])
+def layers():
+    # Pressure profile and resultant of a layered soil for one wall movement
+    body = request.get_json(silent=True)
+    try:
+        soil = stratigraphy.Stratigraphy.from_records(body['layers'])
+        u_r = float(body.get('u_r', 0))
+        water_table = float(body.get('water_table', 0))
+        depth = body.get('depths')
+        profile = soil.lateral_profile(u_r, water_table, depth=depth, num=int(body.get('num', 200)))
+        thrust = soil.resultant(u_r, water_table)
+    except (KeyError, TypeError, ValueError) as error:
+        return {'error': f'invalid layers request: {error}'}, 400
+    return {
+        'profile': {key: values.tolist() for key, values in profile.items()},
+        'resultant': {key: float(value) for key, value in thrust.items()},
+        'k': soil.mobilized_k(u_r).tolist(),
+    }
+
+
+@blueprint.route('/stages', methods=['POST'])
+def stages():
+    body = request.get_json(silent=True)
+    try:
+        results, recomputed = staging.history.evaluate(body['stages'], body['soil'])
+    except (KeyError, TypeError, ValueError) as error:
+        return {'error': f'invalid stages request: {error}'}, 400
+    return {
+        'stages': [dict(result, state=STATE_NAMES[result['state']]) for result in results],
+        'recomputed': recomputed,
+    }
+
+
+# Ranges of the design table if the query does not give them
+EXPORT_DEFAULTS = {
+    'friction_angle': '20:50:0.5',
+    'h': '2:30:2',
+    'u_r': '0',
+    'water_table': '0',
+    'gamma_1': '18',
+    'gamma_r_1': '19',
+}
+
+
+@blueprint.route('/export', methods=['GET'])
+def export_table():
+    try:
+        grids = {name: sweep.parse_range(request.args.get(name, default), max_count=export.MAX_ROWS)
+                 for name, default in EXPORT_DEFAULTS.items()}
+    except (ValueError, ZeroDivisionError) as error:
+        return {'error': f'invalid range: {error}'}, 400
+    rows = export.table_size(grids)
+    if rows > export.MAX_ROWS:
+        return {'error': f'the table has {rows} rows, at most {export.MAX_ROWS} can be exported'}, 400
+    table_format = request.args.get('format', 'csv')
+    if table_format == 'csv':
+        return Response(stream_with_context(export.csv_stream(grids)), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=design_table.csv'})
+    if table_format == 'xlsx':
+        if rows + 1 > export.XLSX_MAX_ROWS:
+            return {'error': f'an xlsx sheet holds at most {export.XLSX_MAX_ROWS - 1} rows, use format=csv'}, 400
+        return Response(export.xlsx_stream(grids),
+                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                        headers={'Content-Disposition': 'attachment; filename=design_table.xlsx'})
+    return {'error': 'format must be csv or xlsx'}, 400
+
+
+def _csv_records(text):
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+@blueprint.route('/calibrate', methods=['POST'])
+def calibrate():
+    # Back-calculated parameters of every wall in the uploaded measurements
+    upload = request.files.get('file')
+    if upload is not None:
+        measurements = _csv_records(upload.read().decode('utf-8-sig'))
+    elif request.mimetype == 'text/csv':
+        measurements = _csv_records(request.get_data(as_text=True))
+    else:
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get('measurements'), list):
+            return {'error': 'expected a CSV upload or {"measurements": [...]}'}, 400
+        measurements = body['measurements']
+    try:
+        walls = calibration.calibrate(measurements)
+    except ValueError as error:
+        return {'error': str(error)}, 400
+    return {'walls': walls}
+
+
+@blueprint.route('/jobs', methods=['POST'])
+def submit_job():
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get('params', {}), dict):
+        return {'error': 'expected {"kind": ..., "params": {...}}'}, 400
+    try:
+        job_id = jobs.submit(body.get('kind'), body.get('params', {}))
+    except ValueError as error:
+        return {'error': str(error)}, 400
+    return {'id': job_id}, 202
+
+
+@blueprint.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    status = jobs.status(job_id)
+    if status is None:
+        return {'error': 'unknown job'}, 404
+    return status
+
+
+@blueprint.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    if not jobs.cancel(job_id):
+        return {'error': 'unknown job'}, 404
+    return {'id': job_id, 'cancelled': True}, 202
+
+
+@blueprint.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    result = jobs.result(job_id)
+    if result is None:
+        status = jobs.status(job_id)
+        return {'error': 'unknown job' if status is None else f"job is {status['state']}"}, 404
+    return Response(json.dumps(result), mimetype='application/json')
+
+
+def register(server):
+    """Add the API routes to the Flask server."""
+    server.register_blueprint(blueprint)
@@ -0,0 +1,147 @@
+// Clientside versions of the cheap callbacks of earth_pressure.py.
+// The Python functions are the reference implementation, keep both in sync.
+window.dash_clientside = window.dash_clientside || {};
+
+(function () {
+    // u/h limits depending on the friction angle, see solver.u_limits
+    const U_LIMIT_BOUNDS = [25, 30, 35, 40];
+    const U_R_MIN = [-0.008, -0.004, -0.002, -0.0015, -0.0006];
+    const U_R_MAX = [0.04, 0.02, 0.012, 0.008, 0.004];
+
+    // Exponents of the mobilization curves, see solver.A_A and solver.A_B
+    const A_A = 3.5;
+    const A_B = 5;
+
+    function uLimits(frictionAngle) {
+        let idx = 0;
+        while (idx < U_LIMIT_BOUNDS.length && frictionAngle >= U_LIMIT_BOUNDS[idx]) {
+            idx++;
+        }
+        return [U_R_MIN[idx], U_R_MAX[idx]];
+    }
+
+    function mobilizedK(u_r, frictionAngle, u_r_min, u_r_max) {
+        const sinPhi = Math.sin(frictionAngle * Math.PI / 180);
+        const k_0 = 1 - sinPhi;
+        const k_a_ult = (1 - sinPhi) / (1 + sinPhi);
+        const k_p_ult = 1 / k_a_ult;
+        if (u_r < 0) {
+            return k_0 - (k_0 - k_a_ult) * (1 - Math.exp(-A_A * u_r / u_r_min));
+        }
+        return k_0 + (k_p_ult - k_0) * (1 - Math.exp(-A_B * u_r / u_r_max));
+    }
+
+    function withX(trace, x) {
+        return Object.assign({}, trace, {x: x});
+    }
+
+    window.dash_clientside.earth_pressure = {
+        // Mirrors update_gamma_prime
+        update_gamma_prime: function (gamma_r1, h, friction_angle) {
+            const gamma_prime1 = (gamma_r1 === null || gamma_r1 === undefined)
+                ? 'None' : String(Math.round((gamma_r1 - 10) * 100) / 100);
+            const [h_u_min, h_u_max] = uLimits(friction_angle);
+            const marks = {};
+            marks[h_u_max] = 'Passive';
+            marks[0] = 'At-Rest';
+            marks[h_u_min] = 'Active';
+            return ['= ' + gamma_prime1 + ' kN/m³', h, h_u_max, h_u_min, marks];
+        },
+
+        // Moves the wall and the K marker of the soil figure, mirrors build_figures
+        move_wall: function (u_r, u_r_max, u_r_min, h, friction_angle, figure) {
+            if (!figure || !figure.data || u_r === null || u_r === undefined) {
+                return window.dash_clientside.no_update;
+            }
+            const data = figure.data.slice();
+            // The soil layer trace is only drawn for walls with a height
+            const offset = data.length - 8;
+            const s = 0.1 * (u_r_min + u_r_max);
+            const y_top = -0.1 * h;
+
+            if (offset === 1) {
+                data[0] = withX(data[0], [s + u_r, s, 2 * u_r_max, 2 * u_r_max]);
+            }
+            data[offset + 1] = withX(data[offset + 1], [-s + u_r, -s, s, s + u_r, -s + u_r]);
+            data[offset + 3] = withX(data[offset + 3], [0, ((h - y_top) / h) * u_r]);
+            data[offset + 4] = withX(data[offset + 4], [u_r, 2 * u_r_max]);
+            data[offset + 5] = withX(data[offset + 5], [u_r, 2 * u_r_max]);
+
+            const marker = Object.assign({}, data[offset + 7].marker, {
+                color: u_r < 0 ? 'blue' : u_r === 0 ? 'black' : 'green'
+            });
+            data[offset + 7] = Object.assign({}, data[offset + 7], {
+                x: [u_r],
+                y: [mobilizedK(u_r, friction_angle, u_r_min, u_r_max)],
+                marker: marker,
+                name: u_r < 0 ? 'Active_K' : u_r === 0 ? 'K_0(At-rest)' : 'Passive_K'
+            });
+            return Object.assign({}, figure, {data: data});
+        },
+
+        // Plays the precomputed animation frames on both graphs at the same time
+        play_animation: function (animation) {
+            if (!animation || !animation.frames) {
+                return window.dash_clientside.no_update;
+            }
+            const options = {
+                frame: {duration: 50, redraw: false},
+                transition: {duration: 0},
+                mode: 'immediate'
+            };
+            const last = animation.frames[animation.frames.length - 1];
+            ['soil-layers-graph', 'pressure-graph'].forEach(function (id) {
+                const graph = document.getElementById(id);
+                const plot = graph && graph.querySelector('.js-plotly-plot');
+                if (!plot) {
+                    return;
+                }
+                const loaded = function () {
+                    return plot._transitionData && plot._transitionData._frameHash &&
+                        plot._transitionData._frameHash[last] !== undefined;
+                };
+                // Play once dcc.Graph has drawn the new figure with the frames of this click
+                if (loaded()) {
+                    Plotly.animate(plot, animation.frames, options);
+                    return;
+                }
+                const events = ['plotly_afterplot', 'plotly_react'];
+                const play = function () {
+                    if (!loaded()) {
+                        return;
+                    }
+                    events.forEach(function (event) {
+                        plot.removeListener(event, play);
+                    });
+                    Plotly.animate(plot, animation.frames, options);
+                };
+                events.forEach(function (event) {
+                    plot.on(event, play);
+                });
+            });
+            return window.dash_clientside.no_update;
+        },
+
+        // Numbers the live update requests of this page while sliders are dragged
+        live_request: function (u_r, h, friction_angle, water_table, live_mode, previous) {
+            if (!live_mode || live_mode.indexOf('live') < 0) {
+                return window.dash_clientside.no_update;
+            }
+            const session = (previous && previous.session) ||
+                (window.crypto && window.crypto.randomUUID ? window.crypto.randomUUID()
+                    : String(Math.random()).slice(2));
+            return {session: session, seq: previous ? previous.seq + 1 : 0};
+        },
+
+        // Points the design table links at the current inputs
+        export_links: function (u_r, gamma_1, gamma_r_1, water_table) {
+            const values = [u_r, gamma_1, gamma_r_1, water_table];
+            if (values.some(function (value) { return value === null || value === undefined; })) {
+                return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+            }
+            const query = new URLSearchParams({u_r: u_r, gamma_1: gamma_1, gamma_r_1: gamma_r_1,
+                                               water_table: water_table}).toString();
+            return ['/api/export?format=csv&' + query, '/api/export?format=xlsx&' + query];
+        }
+    };
+})();
@@ -0,0 +1,196 @@
+"""Micro-benchmarks of the callbacks and solver kernels of earth_pressure.py.
+
+Every benchmark runs over a grid of ϕ′, h, u/h and water table values and
+reports the median and minimum time per call. Results are appended to a JSON
+lines history, and each run is compared with the previous record of the same
+machine so regressions show up before deployment.
+
+    python benchmarks/bench_callbacks.py [--repeat N] [--threshold 0.2] [--fail-on-regression]
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import plotly  # noqa: E402
+
+import earth_pressure  # noqa: E402
+import figure_cache  # noqa: E402
+import figures  # noqa: E402
+import pressure_profile  # noqa: E402
+import solver  # noqa: E402
+
+
+DEFAULT_HISTORY = os.path.join(ROOT, 'benchmarks', 'history.jsonl')
+
+# Parameter grid of the benchmarks
+FRICTION_ANGLES = (20, 30, 40, 50)
+HEIGHTS = (2, 10, 30)
+# u/h as fractions of the active (-1) and passive (1) limit
+U_FRACTIONS = (-1, -0.5, 0, 0.5, 1)
+# water table as fraction of h
+WATER_FRACTIONS = (0, 0.5, 1)
+GAMMA_1 = 18
+GAMMA_R_1 = 19
+
+
+def grid():
+    # Yields the update_graphs inputs of every grid point
+    for friction_angle, h, u_fraction, water_fraction in itertools.product(
+            FRICTION_ANGLES, HEIGHTS, U_FRACTIONS, WATER_FRACTIONS):
+        u_r_min, u_r_max = (float(limit) for limit in solver.u_limits(friction_angle))
+        u_r = round(u_fraction * (u_r_max if u_fraction > 0 else -u_r_min), 5)
+        yield dict(u_r=u_r, u_r_max=u_r_max, u_r_min=u_r_min, h=h, gamma_1=GAMMA_1, gamma_r_1=GAMMA_R_1,
+                   water_table=round(water_fraction * h / 2) * 2, friction_angle=friction_angle)
+
+
+def timed(func, cases, repeat):
+    # Returns the median and minimum time per call in microseconds over all cases
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for case in cases:
+            func(case)
+        samples.append((time.perf_counter_ns() - start) / len(cases) / 1000)
+    return {'median_us': statistics.median(samples), 'min_us': min(samples), 'calls': len(cases)}
+
+
+def figure_inputs(c):
+    # Arguments of the figure functions of build_figures, computed in the same way
+    u_data, k = solver.k_curve(c['friction_angle'], c['u_r_min'], c['u_r_max'])
+    state = solver.solve(c['u_r'], c['h'], c['friction_angle'], c['gamma_1'], c['gamma_r_1'],
+                         c['water_table'], u_r_min=c['u_r_min'], u_r_max=c['u_r_max'])
+    sigma_v_0 = float(state['sigma_v0'])
+    x_circle_0, y_circle_0 = solver.circle_points(*solver.mohr_circle(sigma_v_0, state['sigma_h0']))
+    x_circle, y_circle = solver.circle_points(*solver.mohr_circle(sigma_v_0, state['sigma_h']))
+    profile_args = (state['k'], c['h'], c['gamma_1'], c['gamma_r_1'], c['water_table'])
+    return {
+        'soil': (c['u_r'], c['u_r_max'], c['u_r_min'], c['h'], c['water_table'], u_data, k, state,
+                 float(state['k_p_ult'])),
+        'mohr': (c['u_r'], c['friction_angle'], state, sigma_v_0, x_circle_0, y_circle_0, x_circle, y_circle),
+        'profile': (c['h'], pressure_profile.lateral_profile(*profile_args),
+                    pressure_profile.resultant(*profile_args)),
+    }
+
+
+def serialize(figure_pair):
+    return json.dumps(figure_pair, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def run(repeat):
+    cases = list(grid())
+    built = [figures.build_figures(**case) for case in cases]
+    results = {}
+
+    results['update_gamma_prime'] = timed(
+        lambda c: earth_pressure.update_gamma_prime(c['gamma_r_1'], c['h'], c['friction_angle']), cases, repeat)
+
+    # update_graphs split in its phases, without the figure cache
+    results['update_graphs.compute'] = timed(
+        lambda c: solver.solve(c['u_r'], c['h'], c['friction_angle'], c['gamma_1'], c['gamma_r_1'],
+                               c['water_table'], u_r_min=c['u_r_min'], u_r_max=c['u_r_max']), cases, repeat)
+    # Figure building alone, on the precomputed solver results
+    inputs = [figure_inputs(case) for case in cases]
+    results['update_graphs.figures'] = timed(
+        lambda i: (figures._soil_layers_figure(*i['soil']), figures._mohr_circle_figure(*i['mohr']),
+                   figures.profile_figure(*i['profile'])), inputs, repeat)
+    results['update_graphs.serialize'] = timed(serialize, built, repeat)
+
+    # Whole callback with a cold and a warm figure cache
+    def cold(c):
+        figure_cache.cache.clear()
+        earth_pressure.update_graphs(1, c['u_r'], c['u_r_max'], c['u_r_min'], c['h'], c['gamma_1'],
+                                     c['gamma_r_1'], c['water_table'], c['friction_angle'], None)
+
+    def warm(c):
+        earth_pressure.update_graphs(1, c['u_r'], c['u_r_max'], c['u_r_min'], c['h'], c['gamma_1'],
+                                     c['gamma_r_1'], c['water_table'], c['friction_angle'], None)
+
+    results['update_graphs.cold'] = timed(cold, cases, repeat)
+    for case in cases:
+        warm(case)
+    results['update_graphs.warm'] = timed(warm, cases, repeat)
+
+    # Numeric kernels, one vectorized call over the whole grid
+    columns = {name: np.array([case[name] for case in cases], dtype=float) for name in cases[0]}
+    results['kernel.solve'] = timed(
+        lambda _: solver.solve(columns['u_r'], columns['h'], columns['friction_angle'], columns['gamma_1'],
+                               columns['gamma_r_1'], columns['water_table']), [None], repeat)
+    results['kernel.k_curve'] = timed(lambda _: solver.k_curve(columns['friction_angle']), [None], repeat)
+    state = solver.solve(columns['u_r'], columns['h'], columns['friction_angle'], columns['gamma_1'],
+                         columns['gamma_r_1'], columns['water_table'])
+    center, radius = solver.mohr_circle(state['sigma_v0'], state['sigma_h'])
+    results['kernel.circle_points'] = timed(lambda _: solver.circle_points(center, radius), [None], repeat)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def regressions(results, previous, threshold):
+    # Benchmarks whose median got slower than the previous record by more than threshold
+    slower = {}
+    for name, result in results.items():
+        before = previous['results'].get(name)
+        if before and result['median_us'] > before['median_us'] * (1 + threshold):
+            slower[name] = result['median_us'] / before['median_us'] - 1
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='repetitions of every benchmark')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON lines file of previous results')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown reported as regression')
+    parser.add_argument('--no-save', action='store_true', help='do not append the results to the history')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with 1 on regressions')
+    args = parser.parse_args(argv)
+
+    record = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'machine': platform.node(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'plotly': plotly.__version__,
+        'results': run(args.repeat),
+    }
+
+    for name, result in record['results'].items():
+        print(f"{name:28s} {result['median_us']:12.1f} us  (min {result['min_us']:.1f} us)")
+
+    previous = [entry for entry in load_history(args.history) if entry.get('machine') == record['machine']]
+    slower = regressions(record['results'], previous[-1], args.threshold) if previous else {}
+    for name, change in slower.items():
+        print(f'REGRESSION {name}: {change:+.0%} against {previous[-1]["commit"]}')
+
+    if not args.no_save:
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    return 1 if slower and args.fail_on_regression else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
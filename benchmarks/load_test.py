@@ -0,0 +1,276 @@
+"""Load generator for the /_dash-update-component endpoint of earth_pressure.py.
+
+Simulated users replay random slider moves and "Update Graphs" clicks like the
+browser does: a move of h or ϕ′ triggers update_gamma_prime, a click triggers
+update_graphs with the current slider state and the graph state of the last
+response, so partial updates and the figure cache behave as in production.
+
+The requests go either to the Flask server in-process or to a running server:
+
+    python benchmarks/load_test.py --users 50 --steps 40
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --users 200
+    python benchmarks/load_test.py --gunicorn --workers 4 --users 200
+
+Throughput and p50/p95/p99 latency are reported for both callbacks.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ENDPOINT = '/_dash-update-component'
+HEADERS = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'}
+
+
+def callback_outputs():
+    # Output strings of the server callbacks as registered by Dash
+    import earth_pressure
+    outputs = {}
+    for key in earth_pressure.app.callback_map:
+        if '@' in key:
+            continue
+        if 'gamma_prime_1.children' in key:
+            outputs['update_gamma_prime'] = key
+        elif 'soil-layers-graph.figure' in key and 'graph-state.data' in key:
+            outputs['update_graphs'] = key
+    return outputs
+
+
+def _outputs_list(output):
+    # '..a.b...c.d..' -> [{'id': 'a', 'property': 'b'}, ...]
+    items = output.strip('.').split('...')
+    return [dict(zip(('id', 'property'), item.rsplit('.', 1))) for item in items]
+
+
+def _prop(id, property, value):
+    return {'id': id, 'property': property, 'value': value}
+
+
+class User:
+    """One simulated browser session with its own slider state."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.state = {'u/h': 0, 'h': 10, 'friction_angle': 30, 'water-table': 0,
+                      'gamma_1': 18, 'gamma_r_1': 19}
+        self.limits = {'max': 0.012, 'min': -0.002}
+        self.graph_state = None
+        self.n_clicks = 0
+
+    def move_slider(self):
+        # Returns the changed slider id
+        slider = self.rng.choice(('u/h', 'u/h', 'h', 'friction_angle', 'water-table'))
+        if slider == 'u/h':
+            value = round(self.rng.uniform(self.limits['min'], self.limits['max']), 5)
+        elif slider == 'h':
+            value = self.rng.randrange(2, 31, 2)
+            self.state['water-table'] = min(self.state['water-table'], value)
+        elif slider == 'friction_angle':
+            value = self.rng.randrange(40, 101) / 2
+        else:
+            value = self.rng.randrange(0, self.state['h'] + 1, 2)
+        self.state[slider] = value
+        return slider
+
+    def gamma_prime_request(self, output, changed):
+        return {
+            'output': output,
+            'outputs': _outputs_list(output),
+            'inputs': [_prop('gamma_r_1', 'value', self.state['gamma_r_1']),
+                       _prop('h', 'value', self.state['h']),
+                       _prop('friction_angle', 'value', self.state['friction_angle'])],
+            'changedPropIds': [f'{changed}.value'],
+            'state': [],
+        }
+
+    def graphs_request(self, output):
+        self.n_clicks += 1
+        return {
+            'output': output,
+            'outputs': _outputs_list(output),
+            'inputs': [_prop('update-button', 'n_clicks', self.n_clicks)],
+            'changedPropIds': ['update-button.n_clicks'],
+            'state': [_prop('u/h', 'value', self.state['u/h']),
+                      _prop('u/h', 'max', self.limits['max']),
+                      _prop('u/h', 'min', self.limits['min']),
+                      _prop('h', 'value', self.state['h']),
+                      _prop('gamma_1', 'value', self.state['gamma_1']),
+                      _prop('gamma_r_1', 'value', self.state['gamma_r_1']),
+                      _prop('water-table', 'value', self.state['water-table']),
+                      _prop('friction_angle', 'value', self.state['friction_angle']),
+                      _prop('graph-state', 'data', self.graph_state),
+                      _prop('mohr-family', 'value', [])],
+        }
+
+    def apply_response(self, name, response):
+        # Keep the outputs the browser would store for the next requests
+        values = response.get('response', {})
+        if name == 'update_gamma_prime':
+            self.limits = {'max': values['u/h']['max'], 'min': values['u/h']['min']}
+            self.state['u/h'] = min(max(self.state['u/h'], self.limits['min']), self.limits['max'])
+        else:
+            self.graph_state = values.get('graph-state', {}).get('data', self.graph_state)
+
+
+class InProcessClient:
+    def __init__(self):
+        import earth_pressure
+        self.client = earth_pressure.app.server.test_client()
+
+    def post(self, payload):
+        response = self.client.post(ENDPOINT, data=json.dumps(payload), headers=HEADERS)
+        return response.status_code, _decode(response.data, response.headers.get('Content-Encoding'))
+
+
+class HttpClient:
+    def __init__(self, url):
+        self.url = url.rstrip('/') + ENDPOINT
+
+    def post(self, payload):
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode(), headers=HEADERS)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, _decode(response.read(), response.headers.get('Content-Encoding'))
+        except urllib.error.HTTPError as error:
+            return error.code, None
+
+
+def _decode(data, content_encoding):
+    if content_encoding == 'gzip':
+        data = gzip.decompress(data)
+    # 204 responses of PreventUpdate have no body
+    return json.loads(data) if data else {}
+
+
+def run_user(seed, steps, click_probability, think, make_client, outputs, samples, errors, lock):
+    user = User(seed)
+    client = make_client()
+    for _ in range(steps):
+        changed = user.move_slider()
+        requests = []
+        if changed in ('h', 'friction_angle') and 'update_gamma_prime' in outputs:
+            requests.append(('update_gamma_prime', user.gamma_prime_request(outputs['update_gamma_prime'], changed)))
+        if user.rng.random() < click_probability:
+            requests.append(('update_graphs', None))
+        for name, payload in requests:
+            if payload is None:
+                payload = user.graphs_request(outputs['update_graphs'])
+            start = time.perf_counter()
+            status, response = client.post(payload)
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[name].append(elapsed)
+                if status not in (200, 204):
+                    errors[name] += 1
+            if status == 200 and response:
+                user.apply_response(name, response)
+        if think:
+            time.sleep(user.rng.expovariate(1 / think))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def report(samples, errors, duration):
+    summary = {}
+    for name, values in samples.items():
+        if not values:
+            continue
+        summary[name] = {
+            'requests': len(values),
+            'errors': errors[name],
+            'throughput_rps': len(values) / duration,
+            'mean_ms': statistics.fmean(values) * 1000,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+        }
+    return summary
+
+
+def start_gunicorn(port, workers, threads):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'earth_pressure:server', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--threads', str(threads)], cwd=ROOT)
+    url = f'http://127.0.0.1:{port}'
+    # Wait until the workers answer
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(url, timeout=1).close()
+            return process, url
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start within 30 s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20, help='concurrent simulated users')
+    parser.add_argument('--steps', type=int, default=30, help='slider moves per user')
+    parser.add_argument('--click-probability', type=float, default=0.7, help='chance of an update click per move')
+    parser.add_argument('--think-ms', type=float, default=0, help='mean pause between moves')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help='base URL of a running server instead of in-process requests')
+    parser.add_argument('--gunicorn', action='store_true', help='start a local gunicorn for the test')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args(argv)
+
+    outputs = callback_outputs()
+    process = None
+    if args.gunicorn:
+        process, url = start_gunicorn(args.port, args.workers, args.threads)
+        make_client = lambda: HttpClient(url)  # noqa: E731
+    elif args.url:
+        make_client = lambda: HttpClient(args.url)  # noqa: E731
+    else:
+        make_client = InProcessClient
+
+    samples = {name: [] for name in outputs}
+    errors = {name: 0 for name in outputs}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=run_user, args=(
+        args.seed + i, args.steps, args.click_probability, args.think_ms / 1000, make_client,
+        outputs, samples, errors, lock)) for i in range(args.users)]
+    try:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    summary = report(samples, errors, duration)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for name, result in summary.items():
+            print(f"{name:20s} {result['requests']:6d} req  {result['throughput_rps']:8.1f} req/s  "
+                  f"p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms  "
+                  f"p99 {result['p99_ms']:7.1f} ms  errors {result['errors']}")
+
+
+if __name__ == '__main__':
+    main()
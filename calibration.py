@@ -0,0 +1,156 @@
+"""Back-calculation of ϕ′, a_a and a_b from measured horizontal pressures.
+
+Every measurement is a wall movement u/h with the effective horizontal
+pressure σ_h′ measured at a depth of a wall. The model pressure is
+K(u/h; ϕ′, a_a, a_b) σ_v′(depth) with the mobilization laws of
+solver.mobilized_k, and the three parameters of every wall are fitted by
+Levenberg-Marquardt on the pressure residuals.
+
+All walls are fitted at once: the measurements are packed into arrays of shape
+(walls, points) padded with a mask, the residuals and their analytic Jacobians
+are evaluated for all walls in one pass and the damped normal equations are
+solved with one batched np.linalg.solve per iteration. Each wall has its own
+damping and stops when it has converged.
+
+The u/h limits follow ϕ′ through solver.u_limits like in the app. They are
+piecewise constant in ϕ′, so they do not enter the Jacobian; a step across a
+limit bound is only kept when it lowers the residuals like any other step.
+"""
+import numpy as np
+
+import solver
+
+
+MEASUREMENT_KEYS = ('u_r', 'depth', 'sigma_h', 'h', 'gamma_1', 'gamma_r_1', 'water_table')
+PARAMETERS = ('friction_angle', 'a_a', 'a_b')
+INITIAL = (30.0, solver.A_A, solver.A_B)
+BOUNDS = ((15.0, 55.0), (0.1, 50.0), (0.1, 50.0))
+
+
+def k_and_jacobian(u_r, friction_angle, a_a, a_b, u_r_min, u_r_max):
+    """Return K and its derivatives by (ϕ′ in degrees, a_a, a_b) stacked on the last axis."""
+    phi = np.radians(friction_angle)
+    sin_phi, cos_phi = np.sin(phi), np.cos(phi)
+    k_0, k_a_ult, k_p_ult = solver.earth_pressure_coefficients(friction_angle)
+    # Derivatives of the limit coefficients by ϕ′ in radians
+    dk_0 = -cos_phi
+    dk_a_ult = -2 * cos_phi / (1 + sin_phi) ** 2
+    dk_p_ult = -dk_a_ult / k_a_ult ** 2
+
+    # Both branches are evaluated everywhere, the unused one may overflow
+    with np.errstate(over='ignore', invalid='ignore'):
+        ratio_a = u_r / u_r_min
+        ratio_b = u_r / u_r_max
+        exp_a = np.exp(-a_a * ratio_a)
+        exp_b = np.exp(-a_b * ratio_b)
+        k_a = k_0 - (k_0 - k_a_ult) * (1 - exp_a)
+        k_p = k_0 + (k_p_ult - k_0) * (1 - exp_b)
+        dk_a = np.stack([(dk_0 - (dk_0 - dk_a_ult) * (1 - exp_a)) * np.pi / 180,
+                         -(k_0 - k_a_ult) * ratio_a * exp_a,
+                         np.zeros_like(exp_a)], axis=-1)
+        dk_p = np.stack([(dk_0 + (dk_p_ult - dk_0) * (1 - exp_b)) * np.pi / 180,
+                         np.zeros_like(exp_b),
+                         (k_p_ult - k_0) * ratio_b * exp_b], axis=-1)
+    active = u_r < 0
+    return np.where(active, k_a, k_p), np.where(active[..., np.newaxis], dk_a, dk_p)
+
+
+def pack(wall, *columns):
+    """Return the wall ids, the mask and the columns packed to arrays of shape (walls, points)."""
+    walls, index = np.unique(np.asarray(wall).astype(str), return_inverse=True)
+    order = np.argsort(index, kind='stable')
+    counts = np.bincount(index)
+    rows = index[order]
+    # Position of every measurement within its wall
+    positions = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    shape = (len(walls), counts.max() if len(counts) else 0)
+    mask = np.zeros(shape, dtype=bool)
+    mask[rows, positions] = True
+    packed = []
+    for column in columns:
+        values = np.zeros(shape)
+        values[rows, positions] = np.asarray(column, dtype=float)[order]
+        packed.append(values)
+    return walls, mask, packed
+
+
+def _residuals(params, u_r, sigma_v, sigma_h, mask):
+    # Pressure residuals of shape (walls, points) and their Jacobian (walls, points, 3)
+    friction_angle, a_a, a_b = (params[:, i, np.newaxis] for i in range(3))
+    u_r_min, u_r_max = solver.u_limits(friction_angle)
+    k, dk = k_and_jacobian(u_r, friction_angle, a_a, a_b, u_r_min, u_r_max)
+    residual = np.where(mask, k * sigma_v - sigma_h, 0)
+    jacobian = np.where(mask[..., np.newaxis], dk * sigma_v[..., np.newaxis], 0)
+    return residual, jacobian
+
+
+def fit(u_r, sigma_v, sigma_h, mask, initial=INITIAL, bounds=BOUNDS, max_iter=200, tol=1e-10):
+    """Fit (ϕ′, a_a, a_b) of every wall to packed measurements of shape (walls, points).
+
+    Returns a dict of the parameters (walls, 3), the residual sum of squares,
+    the iterations and whether each wall converged.
+    """
+    lower, upper = np.asarray(bounds, dtype=float).T
+    walls = mask.shape[0]
+    params = np.clip(np.broadcast_to(np.asarray(initial, dtype=float), (walls, 3)), lower, upper)
+    damping = np.full(walls, 1e-3)
+    iterations = np.zeros(walls, dtype=int)
+    converged = np.zeros(walls, dtype=bool)
+    diagonal = np.arange(3)
+
+    residual, jacobian = _residuals(params, u_r, sigma_v, sigma_h, mask)
+    cost = np.sum(residual ** 2, axis=1)
+    active = cost > 0
+    converged[~active] = True
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        # Damped normal equations of all walls, solved in one batched call
+        normal = np.einsum('wmi,wmj->wij', jacobian, jacobian)
+        gradient = np.einsum('wmi,wm->wi', jacobian, residual)
+        system = normal.copy()
+        system[:, diagonal, diagonal] += damping[:, np.newaxis] * normal[:, diagonal, diagonal] + 1e-12
+        step = np.linalg.solve(system, -gradient[..., np.newaxis])[..., 0]
+        trial = np.clip(params + step, lower, upper)
+
+        trial_residual, trial_jacobian = _residuals(trial, u_r, sigma_v, sigma_h, mask)
+        trial_cost = np.sum(trial_residual ** 2, axis=1)
+        better = active & (trial_cost < cost)
+        done = active & ((better & (cost - trial_cost <= tol * cost))
+                         | (np.abs(trial - params).max(axis=1) <= tol))
+
+        params[better] = trial[better]
+        residual[better] = trial_residual[better]
+        jacobian[better] = trial_jacobian[better]
+        cost[better] = trial_cost[better]
+        damping = np.where(better, damping / 10, damping * 10)
+        iterations += active
+        converged |= done
+        active &= ~done & (damping < 1e12)
+    return {'params': params, 'cost': cost, 'iterations': iterations, 'converged': converged}
+
+
+def calibrate(measurements, initial=INITIAL, bounds=BOUNDS, **kwargs):
+    """Fit every wall of a list of measurement dicts and return one result dict per wall.
+
+    Every measurement has the keys of MEASUREMENT_KEYS and optionally 'wall',
+    which groups the measurements of one instrumented wall.
+    """
+    try:
+        columns = np.array([[m[key] for key in MEASUREMENT_KEYS] for m in measurements], dtype=float)
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError(f'every measurement needs numeric values for {", ".join(MEASUREMENT_KEYS)}') from error
+    if not len(columns):
+        raise ValueError('no measurements')
+    u_r, depth, sigma_h, h, gamma_1, gamma_r_1, water_table = columns.T
+    sigma_v = solver.sigma_v0(depth, h, gamma_1, gamma_r_1, water_table)
+    walls, mask, (u_r, sigma_v, sigma_h) = pack([m.get('wall', '1') for m in measurements],
+                                                u_r, sigma_v, sigma_h)
+
+    result = fit(u_r, sigma_v, sigma_h, mask, initial=initial, bounds=bounds, **kwargs)
+    points = mask.sum(axis=1)
+    rmse = np.sqrt(result['cost'] / points)
+    return [dict(zip(PARAMETERS, result['params'][i].tolist()),
+                 wall=str(walls[i]), points=int(points[i]), rmse=float(rmse[i]),
+                 iterations=int(result['iterations'][i]), converged=bool(result['converged'][i]))
+            for i in range(len(walls))]
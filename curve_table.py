@@ -0,0 +1,109 @@
+"""Precomputed K-u/h curves for every friction angle of the ϕ′ slider.
+
+The curve of update_graphs only depends on ϕ′ and the u/h limits derived from
+it, so all 61 slider positions are computed once into a single .npy file. The
+server memory-maps that file, which lets every gunicorn worker share the same
+pages. The file name carries a hash of everything the table is built from,
+so a changed solver or table layout builds a new file instead of serving
+stale curves.
+
+Build the table with:
+
+    python curve_table.py [path]
+"""
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+import solver
+import storage
+
+
+# Friction angles of the ϕ′ slider
+PHI_MIN = 20
+PHI_MAX = 50
+PHI_STEP = 0.5
+CURVE_POINTS = 500
+
+# Column layout of a table row
+PHI, U_R_MIN, U_R_MAX, K_0, K_A_ULT, K_P_ULT = range(6)
+U_DATA = slice(6, 6 + CURVE_POINTS)
+K = slice(6 + CURVE_POINTS, 6 + 2 * CURVE_POINTS)
+
+
+
+def build_key():
+    """Return a hash of the table layout, the solver constants and K values of the solver."""
+    # K at a few probe points stands in for the formulas, so a changed law changes the key too
+    probe = solver.mobilized_k(np.array([-0.003, -0.0005, 0, 0.001, 0.02])[:, np.newaxis],
+                               np.array([20, 30, 42.5]))
+    digest = hashlib.sha1()
+    for value in (PHI_MIN, PHI_MAX, PHI_STEP, CURVE_POINTS, solver.A_A, solver.A_B,
+                  solver.U_LIMIT_BOUNDS, solver.U_R_MIN, solver.U_R_MAX, probe):
+        digest.update(np.asarray(value, dtype=float).tobytes())
+    return digest.hexdigest()[:16]
+
+
+BUILD_KEY = build_key()
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', f'k_curves-{BUILD_KEY}.npy')
+
+_table = None
+
+
+def build():
+    """Return the table with one row per friction angle of the slider."""
+    friction_angle = np.arange(PHI_MIN, PHI_MAX + PHI_STEP / 2, PHI_STEP)
+    u_r_min, u_r_max = solver.u_limits(friction_angle)
+    k_0, k_a_ult, k_p_ult = solver.earth_pressure_coefficients(friction_angle)
+    u_data, k = solver.k_curve(friction_angle, u_r_min, u_r_max, num=CURVE_POINTS)
+
+    table = np.empty((friction_angle.size, K.stop))
+    table[:, PHI] = friction_angle
+    table[:, U_R_MIN] = u_r_min
+    table[:, U_R_MAX] = u_r_max
+    table[:, K_0] = k_0
+    table[:, K_A_ULT] = k_a_ult
+    table[:, K_P_ULT] = k_p_ult
+    table[:, U_DATA] = u_data
+    table[:, K] = k
+    return table
+
+
+def save(path=DEFAULT_PATH):
+    """Build the table and write it to path."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Concurrent workers never map a partial file
+    with storage.atomic_path(path) as tmp_path, open(tmp_path, 'wb') as f:
+        np.save(f, build())
+
+
+def load(path=DEFAULT_PATH):
+    """Memory-map the table at path, building it first if it does not exist."""
+    global _table
+    if not os.path.exists(path):
+        save(path)
+    _table = np.load(path, mmap_mode='r')
+    return _table
+
+
+def lookup(friction_angle, u_r_min, u_r_max):
+    """Return the row of friction_angle, None if it is not in the table.
+
+    Rows are only used when the u/h limits match the ones the table was built
+    with, so stale slider limits fall back to computing the curve.
+    """
+    if _table is None or friction_angle is None:
+        return None
+    index = round((friction_angle - PHI_MIN) / PHI_STEP)
+    if not 0 <= index < len(_table):
+        return None
+    row = _table[index]
+    if row[PHI] != friction_angle or row[U_R_MIN] != u_r_min or row[U_R_MAX] != u_r_max:
+        return None
+    return row
+
+
+if __name__ == '__main__':
+    save(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH)
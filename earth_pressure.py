@@ -1,10 +1,29 @@
 import os
+import json
 import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output, State
+from dash import dcc, html, Patch
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 import numpy as np
-import plotly.graph_objs as go
-import time
+import plotly
+
+import api
+import curve_table
+import encoding
+import figure_cache
+import figures
+import jobs
+import live_updates
+import metrics
+import scenarios
+import solver
+
+
+# Memory-map the precomputed K-u/h curves once at startup
+curve_table.load()
+
+# Run the cheap slider callbacks in the browser instead of on the server
+CLIENTSIDE = os.environ.get('EARTH_PRESSURE_CLIENTSIDE', '0') == '1'
 
 
 app = dash.Dash(__name__, meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}])
@@ -12,6 +31,16 @@ app = dash.Dash(__name__, meta_tags=[{"name": "viewport", "content": "width=devi
 app.title = 'Earth Pressure 1'
 app._favicon = ('assets/favicon.ico')
 
+# Callback timings and cache statistics at /metrics, registered first so that
+# its hooks see the compressed responses
+metrics.register(app.server)
+
+# Gzip the callback responses for clients that accept it
+encoding.register_compression(app.server)
+
+# Headless batch API next to the UI
+api.register(app.server)
+
 # Updated layout with sliders on top and layer properties below
 app.layout = html.Div([
     # Main container
@@ -23,6 +52,35 @@ app.layout = html.Div([
             # Add the update button
             html.Button("Update Graphs", id='update-button', n_clicks=0, style={'width': '100%', 'height': '5vh', 'marginBottom': '1vh'}),
 
+            # Play the wall movement from the active to the passive limit
+            html.Button("Animate", id='animate-button', n_clicks=0, style={'width': '100%', 'height': '5vh', 'marginBottom': '1vh'}),
+            dcc.Store(id='animation'),
+            html.Div(id='animation-player', hidden=True),
+
+            # Update the graphs while the sliders are dragged
+            dcc.Checklist(id='live-mode', options=[{'label': ' Live update', 'value': 'live'}], value=[],
+                          className='input-label'),
+            dcc.Store(id='live-request'),
+
+            # Draw the Mohr circles of many depths with the next update
+            dcc.Checklist(id='mohr-family', options=[{'label': ' Mohr circles over depth', 'value': 'family'}],
+                          value=[], className='input-label'),
+
+            # Pin the current inputs to compare them with other scenarios
+            html.Div(style={'display': 'flex', 'flexDirection': 'row', 'marginBottom': '1vh'}, children=[
+                html.Button("Pin scenario", id='pin-button', n_clicks=0, style={'width': '50%', 'height': '5vh'}),
+                html.Button("Clear pinned", id='clear-pinned-button', n_clicks=0, style={'width': '50%', 'height': '5vh'}),
+            ]),
+            dcc.Store(id='scenarios', data=[]),
+
+            # Design tables over ϕ′ and h for the current soil, water table and u/h
+            html.Div(className='input-label', style={'marginBottom': '1vh'}, children=[
+                'Design table: ',
+                html.A('CSV', id='export-csv', href='/api/export?format=csv', download='design_table.csv'),
+                ' | ',
+                html.A('Excel', id='export-xlsx', href='/api/export?format=xlsx', download='design_table.xlsx'),
+            ]),
+
             # Sliders for each layer
             html.Div(className='slider-container', children=[
                 # horizantal movement Slider
@@ -68,7 +126,7 @@ app.layout = html.Div([
                     "Water Table", 
                             html.Div(className='tooltip', children=[
                                 html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Water table depth from the surface.', className='tooltiptext')
+                                html.Span('Height of the water table above the base of the wall.', className='tooltiptext')
                             ])], className='slider-label'),
                 dcc.Slider(
                     id='water-table', min=0, max=4, step=2, value=0,
@@ -103,16 +161,51 @@ app.layout = html.Div([
                     html.Div(id='gamma_prime_1', className='input-field')  
                 ]),
             ]),
+
+        # Monte Carlo analysis with scattered soil properties around the values above
+        html.Div(className='layer-properties', children=[
+                html.H3('Monte Carlo:', style={'textAlign': 'left'}, className='h3'),
+                html.Label(['Samples'], className='input-label'),
+                dcc.Input(id='mc-samples', type='number', value=1_000_000, min=1000, max=jobs.MAX_CASES, step=1000, className='input-field'),
+                html.Label(['Std of ϕ′ (deg)'], className='input-label'),
+                dcc.Input(id='mc-friction-std', type='number', value=2, min=0, step=0.1, className='input-field'),
+                html.Label(['CoV of γ', html.Sub('d'), ', γ', html.Sub('sat')], className='input-label'),
+                dcc.Input(id='mc-gamma-cov', type='number', value=0.05, min=0, step=0.01, className='input-field'),
+                html.Label(['Water table range ± (m)'], className='input-label'),
+                dcc.Input(id='mc-water-range', type='number', value=0, min=0, step=0.5, className='input-field'),
+                html.Div(style={'display': 'flex', 'flexDirection': 'row', 'marginTop': '1vh'}, children=[
+                    html.Button("Run Monte Carlo", id='mc-button', n_clicks=0, style={'width': '50%', 'height': '5vh'}),
+                    html.Button("Cancel", id='mc-cancel-button', n_clicks=0, style={'width': '50%', 'height': '5vh'}),
+                ]),
+                html.Div(id='mc-status', className='input-label'),
+                dcc.Store(id='mc-run'),
+                dcc.Interval(id='mc-interval', interval=500, disabled=True),
+                html.Div(id='reliability-container', hidden=True, children=[
+                    dcc.Graph(id='reliability-graph', style={'height': '30vh', 'width': '100%'})
+                ]),
+            ]),
+
+        # Overlay of the pinned scenarios
+        html.Div(id='comparison-container', hidden=True, children=[
+                html.H3('Pinned scenarios:', style={'textAlign': 'left'}, className='h3'),
+                dcc.Graph(id='comparison-graph', style={'height': '40vh', 'width': '100%'})
+            ]),
         ]),
 
+        # Inputs of the figures currently shown, used to send partial updates
+        dcc.Store(id='graph-state'),
+
         # Graphs container
         html.Div(className='graph-container', id='graphs-container', style={'display': 'flex', 'flexDirection': 'row', 'width': '75%'},
         children=[
-            html.Div(style={'width': '50%', 'height': '100%'}, children=[
+            html.Div(style={'width': '34%', 'height': '100%'}, children=[
                 dcc.Graph(id='soil-layers-graph', style={'height': '100%', 'width': '100%'})
             ]),
-            html.Div(style={'width': '50%', 'height': '100%'}, children=[
+            html.Div(style={'width': '33%', 'height': '100%'}, children=[
                 dcc.Graph(id='pressure-graph', style={'height': '100%', 'width': '100%'})
+            ]),
+            html.Div(style={'width': '33%', 'height': '100%'}, children=[
+                dcc.Graph(id='profile-graph', style={'height': '100%', 'width': '100%'})
             ])
         ]),
 
@@ -131,37 +224,16 @@ app.layout = html.Div([
 ])
 
 # Callback to control the bounderies of the input fields and sliders
-@app.callback(
-    Output('gamma_prime_1', 'children'),
-    Output('water-table', 'max'),
-    Output('u/h', 'max'),
-    Output('u/h', 'min'),
-    Output('u/h', 'marks'),
-    Input('gamma_r_1', 'value') ,
-    Input('h', 'value'),
-    Input('friction_angle', 'value')
-    )
 def update_gamma_prime(gamma_r1, h, friction_angle):
     # Calculate γ′ as γ_r - 9.81 for each layer
     gamma_prime1 = round(gamma_r1 - 10, 2) if gamma_r1 is not None else None
+    # Whole numbers without a trailing .0, like the clientside version prints them
+    if gamma_prime1 is not None and gamma_prime1 == int(gamma_prime1):
+        gamma_prime1 = int(gamma_prime1)
 
     # water table max cannot be more than u
     water_table_max = h
-    if friction_angle < 25:
-        h_u_max = 0.04
-        h_u_min = -0.008
-    elif friction_angle < 30:
-        h_u_max = 0.02
-        h_u_min = -0.004
-    elif friction_angle < 35:
-        h_u_max = 0.012
-        h_u_min = -0.002
-    elif friction_angle < 40:
-        h_u_max = 0.008
-        h_u_min = -0.0015
-    else:
-        h_u_max = 0.004
-        h_u_min = -0.0006
+    h_u_min, h_u_max = (float(limit) for limit in solver.u_limits(friction_angle))
     marks= {h_u_max: "Passive", 0: "At-Rest", h_u_min: "Active"}
 
     
@@ -169,11 +241,49 @@ def update_gamma_prime(gamma_r1, h, friction_angle):
     return f"= {gamma_prime1} kN/m³",  water_table_max, h_u_max, h_u_min, marks
 
 
+# The slider boundaries can run in the browser (assets/clientside.js), the Python
+# function above stays the reference implementation
+gamma_prime_outputs = [
+    Output('gamma_prime_1', 'children'),
+    Output('water-table', 'max'),
+    Output('u/h', 'max'),
+    Output('u/h', 'min'),
+    Output('u/h', 'marks'),
+]
+gamma_prime_inputs = [
+    Input('gamma_r_1', 'value') ,
+    Input('h', 'value'),
+    Input('friction_angle', 'value'),
+]
+if CLIENTSIDE:
+    app.clientside_callback(
+        ClientsideFunction(namespace='earth_pressure', function_name='update_gamma_prime'),
+        *gamma_prime_outputs, *gamma_prime_inputs
+    )
+
+    # Move the wall and the K marker in the browser while the graphs wait for an update
+    app.clientside_callback(
+        ClientsideFunction(namespace='earth_pressure', function_name='move_wall'),
+        Output('soil-layers-graph', 'figure', allow_duplicate=True),
+        Input('u/h', 'value'),
+        State('u/h', 'max'),
+        State('u/h', 'min'),
+        State('h', 'value'),
+        State('friction_angle', 'value'),
+        State('soil-layers-graph', 'figure'),
+        prevent_initial_call=True
+    )
+else:
+    app.callback(*gamma_prime_outputs, *gamma_prime_inputs)(metrics.instrument('update_gamma_prime')(update_gamma_prime))
+
+
 
 # Callback to handle the animations and input updates
 @app.callback(
     [Output('soil-layers-graph', 'figure'),
-     Output('pressure-graph', 'figure')],
+     Output('pressure-graph', 'figure'),
+     Output('profile-graph', 'figure'),
+     Output('graph-state', 'data')],
     [Input('update-button', 'n_clicks')],   
     [State('u/h', 'value'),
      State('u/h', 'max'),
@@ -182,424 +292,395 @@ def update_gamma_prime(gamma_r1, h, friction_angle):
      State('gamma_1', 'value'),
      State('gamma_r_1', 'value'),
      State('water-table', 'value'),
-     State('friction_angle', 'value')]
+     State('friction_angle', 'value'),
+     State('graph-state', 'data'),
+     State('mohr-family', 'value')]
 )
 
-def update_graphs(n_clicks,u_r, u_r_max, u_r_min, h,gamma_1, gamma_r_1, water_table, friction_angle):
-    # Constants
-    gamma_water = 10 # kN/m³ for water
-    u= u_r*h
+@metrics.instrument('update_graphs')
+def update_graphs(n_clicks,u_r, u_r_max, u_r_min, h,gamma_1, gamma_r_1, water_table, friction_angle, previous,
+                  family=None):
+    inputs = dict(u_r=u_r, u_r_max=u_r_max, u_r_min=u_r_min, h=h, gamma_1=gamma_1,
+                  gamma_r_1=gamma_r_1, water_table=water_table, friction_angle=friction_angle,
+                  family='family' in (family or []))
+    figure_set = get_figures(**inputs)
+    return (*patch_figures(figure_set, inputs, previous), inputs)
 
-    # Ensure y_top has a default value
-    y_top = -0.1*h
 
-    # Define soil layers and their boundaries with specified patterns
-    layers = [
-        {'layer_id': '2', 'name': 'Soil', 'thickness' : h, 'top': 0, 'bottom': h, 'color': 'rgb(244,164,96)',
-         'fillpattern': {'shape': '.'}, 'x0': 0
-         },  # Dots for Sand  
-    ]
+# Callback to precompute the wall movement animation in one request
+@app.callback(
+    Output('soil-layers-graph', 'figure', allow_duplicate=True),
+    Output('pressure-graph', 'figure', allow_duplicate=True),
+    Output('graph-state', 'data', allow_duplicate=True),
+    Output('animation', 'data'),
+    Input('animate-button', 'n_clicks'),
+    State('u/h', 'max'),
+    State('u/h', 'min'),
+    State('h', 'value'),
+    State('gamma_1', 'value'),
+    State('gamma_r_1', 'value'),
+    State('water-table', 'value'),
+    State('friction_angle', 'value'),
+    prevent_initial_call=True
+)
+@metrics.instrument('update_animation')
+def update_animation(n_clicks, u_r_max, u_r_min, h, gamma_1, gamma_r_1, water_table, friction_angle):
+    soil_layers_fig, Mohr_circle_fig = animate_figures(u_r_max, u_r_min, h, gamma_1, gamma_r_1,
+                                                       water_table, friction_angle)
+    # Frame names of this click, so that the browser can tell when the graphs have loaded them
+    for figure in (soil_layers_fig, Mohr_circle_fig):
+        for frame in figure['frames']:
+            frame['name'] = f"{n_clicks}-{frame['name']}"
+    # The graphs no longer show the state of the sliders, the next update sends full figures
+    frames = [frame['name'] for frame in soil_layers_fig['frames']]
+    return soil_layers_fig, Mohr_circle_fig, None, {'n_clicks': n_clicks, 'frames': frames}
+
+
+# Play the animation frames on both graphs in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace='earth_pressure', function_name='play_animation'),
+    Output('animation-player', 'children'),
+    Input('animation', 'data'),
+    prevent_initial_call=True
+)
 
-    # Create the soil layers figure (139,69,19)
-    soil_layers_fig = go.Figure()
-    Mohr_circle_fig = go.Figure()
 
-    # Add the soil layers to the figure
-    
-    for layer in layers:
-        if layer['thickness'] > 0:
-            soil_layers_fig.add_trace(go.Scatter(
-                x=[0.1*(u_r_min+u_r_max)+u_r, 0.1*(u_r_min+u_r_max), 2*(u_r_max), 2*(u_r_max)],  # Create a rectangle-like shape
-                y=[layer['top'], layer['bottom'], layer['bottom'], layer['top']],
-                line=dict(width=1, color='black'),
-                name=layer['name'],
-                showlegend=False,
-                mode='lines',  # Show only the lines, no markers (dots)
-                hoverinfo='skip'
-            ))
-
-    # add at rest earth pressure with dash line
-    soil_layers_fig.add_trace(go.Scatter(
-        x=[-0.1*(u_r_min+u_r_max), -0.1*(u_r_min+u_r_max), 0.1*(u_r_min+u_r_max), 0.1*(u_r_min+u_r_max), -0.1*(u_r_min+u_r_max)],  # Create a rectangle-like shape
-        y=[0, h, h, 0,0],
-        fill='none',
-        line=dict(width=1, color='black', dash='dash'),
-        name='at rest earth pressure',
-        showlegend=False,
-        hoverinfo='skip',  # Skip the hover info for these layers
-        mode='lines'  # Show only the lines, no markers (dots)
-    ))
-
-    # add the earth retaining wall
-    soil_layers_fig.add_trace(go.Scatter(
-        x=[-0.1*(u_r_min+u_r_max)+u_r, -0.1*(u_r_min+u_r_max), 0.1*(u_r_min+u_r_max), 0.1*(u_r_min+u_r_max)+u_r,-0.1*(u_r_min+u_r_max)+u_r],  # Create a rectangle-like shape
-        y=[0, h, h, 0,0],
-        fill='toself',
-        fillcolor='lightgrey',  # Transparent background to see the pattern
-        line=dict(width=1, color='black'),
-        name='Retaining Wall',
-        showlegend=False,
-        hoverinfo='skip',  # Skip the hover info for these layers
-        mode='lines'  # Show only the lines, no markers (dots)
-    ))
-
-    # add a line at the 0 axis and y-top dash
-    soil_layers_fig.add_trace(go.Scatter(
-        x=[0, 0],  # Start at -1 and end at 1
-        y=[h, y_top],  # Horizontal line at the top of the layer
-        mode='lines',
-        line=dict(color='black', width=1, dash='dash'),
-        showlegend=False,  # Hide legend for these lines
-        hoverinfo='skip'  # Skip the hover info for these line
-    ))
-
-    # add a line to show the movement of the wall
-    soil_layers_fig.add_trace(go.Scatter(
-        x=[0, ((h-y_top)/h)*u_r],  
-        y=[h, y_top],  # Horizontal line at the top of the layer
-        mode='lines',
-        line=dict(color='red', width=1, dash='dash'),
-        showlegend=False,  # Hide legend for these lines
-        hoverinfo='skip'  # Skip the hover info for these line
-    ))
-
-
-    # add arrow  from to show the direction of passive 
-    soil_layers_fig.add_annotation(
-        x=0.8*u_r_max,  
-        y=0.5*y_top,
-        ax=0,  # x-coordinate of arrow head
-        ay=0.5*y_top,  # y-coordinate of arrow head
-        xref="x",
-        yref="y",
-        axref="x",
-        ayref="y",
-        showarrow=True,
-        arrowhead=2,
-        arrowsize=1,
-        arrowwidth=3,
-        arrowcolor="green"
-    )
-    # add annotation for the passive
-    soil_layers_fig.add_annotation(
-        x=0.5*u_r_max,  # Position the text slightly to the right of the layer box
-        y=0.8*y_top,
-        text='Passive (compression)',  # Layer name as text
-        font = dict(size=14, color="green", weight='bold'),
-        showarrow=False,  # Don't show an arrow
-        xanchor='center',  # Anchor text to the left
-        yanchor='middle'  # Center text vertically with the midpoint
-    )
-
-    # add arrow  from to show the direction of  active
-    soil_layers_fig.add_annotation(
-        x=3*u_r_min,  
-        y=0.5*y_top,
-        ax=0,  # x-coordinate of arrow head
-        ay=0.5*y_top,  # y-coordinate of arrow head
-        xref="x",
-        yref="y",
-        axref="x",
-        ayref="y",
-        showarrow=True,
-        arrowhead=2,
-        arrowsize=1,
-        arrowwidth=3,
-        arrowcolor="blue"
-    )
-    # add annotation for the passive
-    soil_layers_fig.add_annotation(
-        x=2*u_r_min,  # Position the text slightly to the right of the layer box
-        y=0.8*y_top,
-        text='Active (extension)',  # Layer name as text
-        font = dict(size=14, color="blue", weight='bold'),
-        showarrow=False,  # Don't show an arrow
-        xanchor='center',  # Anchor text to the left
-        yanchor='middle'  # Center text vertically with the midpoint
-    )
+# Number the live update requests in the browser while the sliders are dragged
+app.clientside_callback(
+    ClientsideFunction(namespace='earth_pressure', function_name='live_request'),
+    Output('live-request', 'data'),
+    Input('u/h', 'drag_value'),
+    Input('h', 'drag_value'),
+    Input('friction_angle', 'drag_value'),
+    Input('water-table', 'drag_value'),
+    State('live-mode', 'value'),
+    State('live-request', 'data'),
+    prevent_initial_call=True
+)
 
-    # Add a line at the ground table
-    soil_layers_fig.add_trace(go.Scatter(
-        x=[u_r, 2*u_r_max], 
-        y=[0, 0],  # Horizontal line at the top of the layer
-        mode='lines',
-        line=dict(color='black', width=2),
-        showlegend=False,  # Hide legend for these lines
-        hoverinfo='skip'  # Skip the hover info for these line
-    )) 
-
-
-    # add a line for the water table
-    soil_layers_fig.add_trace(go.Scatter(
-        x=[u_r, 2*u_r_max],  # Start at -1 and end at 1
-        y=[water_table, water_table],  # Horizontal line at the top of the layer
-        mode='lines',
-        line=dict(color='blue', width=2, dash='dot'),
-        showlegend=False,  # Hide legend for these lines
-        hoverinfo='skip'  # Skip the hover info for these line
-    ))
-
-    # u vs k 
-    u_data = np.linspace(2*u_r_min, 2*u_r_max, 500)
-    k_0 = 1 - np.sin(np.radians(friction_angle))
-    k_a_ult = (1 - np.sin(np.radians(friction_angle)))/(1 + np.sin(np.radians(friction_angle)))
-    k_p_ult = 1/k_a_ult
-    sigma_n =0
-
-    a_a = 3.5
-    a_b = 5
-
-    k_a_data = k_0 - (k_0 - k_a_ult) * (1 - np.exp(-a_a * u_data[u_data < 0]/u_r_min))
-    k_p_data =k_0 + (k_p_ult-k_0)  * (1 - np.exp(-a_b* (u_data[u_data > 0])/u_r_max))
-    k = np.zeros_like(u_data)
-    k[u_data < 0] = k_a_data
-    k[u_data > 0] = k_p_data
-    k[u_data == 0] = k_0
-
-    k_a = k_0 - (k_0 - k_a_ult) * (1 - np.exp(-a_a * u_r/u_r_min))
-    k_p = k_0 + (k_p_ult-k_0) * (1 - np.exp(-a_b * u_r/u_r_max))
-
-
-
-    # create a trcae for the k vs u in yaxis 2
-    soil_layers_fig.add_trace(go.Scatter(
-        x=u_data,
-        y=k,
-        yaxis='y2',
-        mode='lines',
-        line=dict(color='red', width=3),
-        name='K',
-        showlegend=False
-    ))
-
-    # add a scatter point for k_a and k_p
-    soil_layers_fig.add_trace(go.Scatter(
-        x=[u_r],
-        y=[k_a if u_r < 0 else k_p],
-        yaxis='y2',
-        mode='markers',
-        marker=dict(color='blue' if u_r<0 else 'black' if u_r == 0 else 'green', size=10),
-        name='Active_K' if u_r < 0 else 'K_0(At-rest)' if u_r == 0 else 'Passive_K',
-        showlegend=False
-    ))
-
-
-   
-    # First figure (soil_layers_fig)
-    soil_layers_fig.update_layout(
-        plot_bgcolor='white',
-        xaxis_title= dict(text='u/h', font=dict(weight='bold')),
-        xaxis=dict(
-            range=[4*u_r_min, 2*u_r_max],  # Adjusting the x-range as needed
-            showticklabels=True,
-            ticks='outside',
-            title_standoff=4,
-            ticklen=5,
-            minor_ticks="inside",
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            zeroline=False,
-            side='bottom'
-        ),
-        yaxis_title= dict(text='h (m)', font=dict(weight='bold')),
-        yaxis=dict(
-            range=[h, y_top],  # Adjusted range for the y-axis (inverted for depth)
-            showticklabels=True,
-            ticks='outside',
-            title_standoff=4,
-            ticklen=5,
-            minor_ticks="inside",
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            zeroline=False,
-            # scaleanchor="x",  # Link y-axis scaling with x-axis
-            # scaleratio=1,
-            side='right'
-        ),
-        # add another y-axis for k
-        yaxis2=dict(
-            title=dict(text='K', font=dict(weight='bold')),
-            overlaying='y',
-            side='left',
-            range=[0, 1.1*k_p_ult],
-            ticks='outside',
-            title_standoff=4,
-            ticklen=5,
-            minor_ticks="inside",
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            zeroline=False,
-
-        ),
-        
-        margin=dict(l=20, r=10),
-    )
 
+# Callback for the live updates, bursts of drag events are coalesced per session
+@app.callback(
+    Output('soil-layers-graph', 'figure', allow_duplicate=True),
+    Output('pressure-graph', 'figure', allow_duplicate=True),
+    Output('profile-graph', 'figure', allow_duplicate=True),
+    Output('graph-state', 'data', allow_duplicate=True),
+    Input('live-request', 'data'),
+    State('u/h', 'drag_value'),
+    State('h', 'drag_value'),
+    State('gamma_1', 'value'),
+    State('gamma_r_1', 'value'),
+    State('water-table', 'drag_value'),
+    State('friction_angle', 'drag_value'),
+    State('graph-state', 'data'),
+    State('mohr-family', 'value'),
+    prevent_initial_call=True
+)
+@metrics.instrument('update_graphs_live')
+def update_graphs_live(request, u_r, h, gamma_1, gamma_r_1, water_table, friction_angle, previous, family=None):
+    if request is None or None in (u_r, h, water_table, friction_angle):
+        raise PreventUpdate
+    # The slider limits are only updated after the drag, derive them from ϕ′ directly
+    u_r_min, u_r_max = (float(limit) for limit in solver.u_limits(friction_angle))
+    inputs = dict(u_r=u_r, u_r_max=u_r_max, u_r_min=u_r_min, h=h, gamma_1=gamma_1,
+                  gamma_r_1=gamma_r_1, water_table=min(water_table, h), friction_angle=friction_angle,
+                  family='family' in (family or []))
+    try:
+        with live_updates.coalescer.turn(request['session'], request['seq']):
+            figure_set = get_figures(**inputs)
+            return (*patch_figures(figure_set, inputs, previous), inputs)
+    except live_updates.Superseded:
+        raise PreventUpdate
+
+
+# Callback to queue a Monte Carlo job, the graph is polled while it runs
+@app.callback(
+    Output('mc-run', 'data'),
+    Output('mc-interval', 'disabled'),
+    Output('mc-status', 'children'),
+    Input('mc-button', 'n_clicks'),
+    State('u/h', 'value'),
+    State('h', 'value'),
+    State('gamma_1', 'value'),
+    State('gamma_r_1', 'value'),
+    State('water-table', 'value'),
+    State('friction_angle', 'value'),
+    State('mc-samples', 'value'),
+    State('mc-friction-std', 'value'),
+    State('mc-gamma-cov', 'value'),
+    State('mc-water-range', 'value'),
+    State('mc-run', 'data'),
+    prevent_initial_call=True
+)
+@metrics.instrument('start_reliability')
+def start_reliability(n_clicks, u_r, h, gamma_1, gamma_r_1, water_table, friction_angle,
+                      samples, friction_std, gamma_cov, water_range, previous):
+    if None in (u_r, h, gamma_1, gamma_r_1, water_table, friction_angle, samples):
+        raise PreventUpdate
+    distributions = {
+        'friction_angle': {'type': 'normal', 'mean': friction_angle, 'std': friction_std or 0},
+        'gamma_1': {'type': 'lognormal', 'mean': gamma_1, 'std': gamma_1 * (gamma_cov or 0)},
+        'gamma_r_1': {'type': 'lognormal', 'mean': gamma_r_1, 'std': gamma_r_1 * (gamma_cov or 0)},
+        'water_table': {'type': 'uniform', 'low': water_table - (water_range or 0),
+                        'high': water_table + (water_range or 0)},
+    }
+    params = {'u_r': u_r, 'h': h, 'distributions': distributions, 'samples': min(int(samples), jobs.MAX_CASES)}
+    try:
+        job_id = jobs.submit('monte_carlo', params)
+    except ValueError as error:
+        return dash.no_update, dash.no_update, f'Not started: {error}'
+    if previous is not None:
+        jobs.cancel(previous)
+    return job_id, False, 'Queued'
+
+
+def _job_message(job):
+    # Progress line of a Monte Carlo job below its buttons
+    if job['state'] == 'running' and job['total']:
+        return f"Running: {job['done']:,} of {job['total']:,} samples"
+    if job['state'] == 'done':
+        return f"Done: {job['done']:,} samples"
+    if job['state'] == 'failed':
+        return f"Failed: {job['error']}"
+    return job['state'].capitalize()
 
 
-    # At-rest effective stresses
-    if water_table > h/2:
-        sigma_v_0 = gamma_1 * (h - water_table) + (gamma_r_1 - gamma_water) * (water_table-h/2)
-    else:
-        sigma_v_0 = gamma_1 * h/2
-    sigma_h_0 = sigma_v_0 * k_0
-    r_0 = (sigma_v_0 - sigma_h_0)/2
-    center_0 = (sigma_v_0 + sigma_h_0) / 2
-
-    # Generate points for the Mohr circle
-    theta_0 = np.linspace(0, 2 * np.pi, 100)  # 100 points for a smooth circle
-    x_circle_0 = center_0 + r_0 * np.cos(theta_0)
-    y_circle_0 = r_0 * np.sin(theta_0)
-
-    # Add the Mohr circle to the figure
-    Mohr_circle_fig.add_trace(go.Scatter(
-        x=x_circle_0,
-        y=y_circle_0,
-        mode='lines',
-        line=dict(color='red', width=2),
-        name='At Rest',
-        showlegend=True
-    ))
-    sigma_n = 1.2 * sigma_v_0
-
-
-    if u_r < 0:
-        # active effectives stresses
-        sigma_h_a = sigma_v_0*k_a
-        R_a = (sigma_v_0 - sigma_h_a)/2
-        center_a = (sigma_v_0 + sigma_h_a)/2
-        # Generate points for the active Mohr circle
-        theta_a = np.linspace(0, 2 * np.pi, 100)
-        x_circle_a = center_a + R_a * np.cos(theta_a)
-        y_circle_a = R_a * np.sin(theta_a)
-        # Add the active Mohr circle to the figure
-        Mohr_circle_fig.add_trace(go.Scatter(
-            x=x_circle_a,
-            y=y_circle_a,
-            mode='lines',
-            line=dict(color='blue', width=2),
-            name='Active',
-            showlegend=True
-        ))
-    elif u_r > 0:
-        # passive effectives stresses
-        sigma_h_p = sigma_v_0*k_p 
-        R_p = (sigma_v_0 - sigma_h_p)/2
-        ceneter_p = (sigma_v_0 + sigma_h_p)/2
-        # Generate points for the passive Mohr circle
-        theta_p = np.linspace(0, 2 * np.pi, 100)
-        x_circle_p = ceneter_p + R_p * np.cos(theta_p)
-        y_circle_p = R_p * np.sin(theta_p)
-        # Add the passive Mohr circle to the figure
-        Mohr_circle_fig.add_trace(go.Scatter(
-            x=x_circle_p,
-            y=y_circle_p,
-            mode='lines',
-            line=dict(color='green', width=2),
-            name='Passive',
-            showlegend=True
-        ))
-        sigma_n = 1.2 * sigma_h_p
-        
+@app.callback(
+    Output('reliability-graph', 'figure'),
+    Output('reliability-container', 'hidden'),
+    Output('mc-interval', 'disabled', allow_duplicate=True),
+    Output('mc-status', 'children', allow_duplicate=True),
+    Input('mc-interval', 'n_intervals'),
+    State('mc-run', 'data'),
+    prevent_initial_call=True
+)
+def poll_reliability(n_intervals, job_id):
+    job = jobs.status(job_id) if job_id else None
+    if job is None:
+        return dash.no_update, dash.no_update, True, dash.no_update
+    finished = job['state'] in jobs.FINISHED
+    if job['summary'] is None:
+        return dash.no_update, dash.no_update, finished, _job_message(job)
+    figure = figures.reliability_figure(job['summary'])
+    encoding.encode_figure(figure)
+    return figure, False, finished, _job_message(job)
+
+
+# Callback to stop the running Monte Carlo job, the polling reports when it stopped
+@app.callback(
+    Output('mc-status', 'children', allow_duplicate=True),
+    Input('mc-cancel-button', 'n_clicks'),
+    State('mc-run', 'data'),
+    prevent_initial_call=True
+)
+def cancel_reliability(n_clicks, job_id):
+    job = jobs.status(job_id) if job_id else None
+    if job is None or job['state'] in jobs.FINISHED:
+        raise PreventUpdate
+    jobs.cancel(job_id)
+    return 'Cancelling'
 
-    # Correct critical state line
-    shear_stress_max = sigma_n * np.tan(np.radians(friction_angle))
-    Mohr_circle_fig.add_trace(go.Scatter(
-        x=[0, sigma_n],  # From origin to max normal stress
-        y=[0, shear_stress_max],  # From cohesion to max shear stress
-        mode='lines',
-        line=dict(color='black', width=2),
-        name='Critical State Line',
-        showlegend=True
-    ))
-
-    Mohr_circle_fig.add_trace(go.Scatter(
-        x=[0, sigma_n],  # From origin to max normal stress
-        y=[0, -shear_stress_max],  # From cohesion to max shear stress
-        mode='lines',
-        line=dict(color='black', width=2),
-        name='Critical State Line',
-        showlegend=False
-    ))
-
-
-
-    Mohr_circle_fig.update_layout(
-        # adding title to the plot at the center top
-        title=dict(text='Mohr Circle for Effective Stresses at depth = h/2', 
-                   x=0.5, 
-                   xanchor='center', 
-                   yanchor='top',
-                    
-                   font=dict(size=20, color='red', weight='bold', family='Arial', style='italic')
-                   ),
-   
-        xaxis_title=dict(text='σ (kPa)', font=dict(weight='bold')),
-        plot_bgcolor='white',
-        xaxis=dict(
-            range=[0, sigma_n],  # Adjusting the x-range as needed
-            title_standoff=4,
-            zeroline=False,
-            showticklabels=True,
-            ticks='outside',
-            ticklen=5,
-            minor_ticks="inside",
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            showgrid=False,
-            gridwidth=1,
-            gridcolor='lightgrey',
-            mirror=True,
-            hoverformat=".2f"  # Sets hover value format for x-axis to two decimal places
-        ),
-        yaxis_title=dict(text='𝜏 (kPa)', font=dict(weight='bold')),
-        yaxis=dict(
-            range=[-shear_stress_max, shear_stress_max],  # Adjusted range for the y-axis (inverted for depth)
-            zeroline=True,
-            zerolinecolor= "black",
-            title_standoff=4,
-            showticklabels=True,
-            ticks='outside',
-            ticklen=5,
-            minor_ticks="inside",
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            showgrid=False,
-            gridwidth=1,
-            gridcolor='lightgrey',
-            mirror=True,
-            hoverformat=".3f",  # Sets hover value format for y-axis to two decimal places
-            scaleanchor="x",  # Link y-axis scaling with x-axis
-            scaleratio=1,
-        ),
-        legend=dict(
-            yanchor="top",  # Align the bottom of the legend box
-            y=1,               # Position the legend at the bottom inside the plot
-            xanchor="right",    # Align the right edge of the legend box
-            x=1,               # Position the legend at the right inside the plot
-            font= dict(size=10),  # Adjust font size
-            bgcolor="rgba(255, 255, 255, 0.7)",  # Optional: Semi-transparent white background
-            bordercolor="black",                 # Optional: Border color
-            borderwidth=1                        # Optional: Border width
-        ),
-        margin=dict(l=10, r=10),
-    )
-    
 
-     
+# Callback to pin the current inputs or clear the pinned scenarios
+@app.callback(
+    Output('scenarios', 'data'),
+    Input('pin-button', 'n_clicks'),
+    Input('clear-pinned-button', 'n_clicks'),
+    State('u/h', 'value'),
+    State('h', 'value'),
+    State('gamma_1', 'value'),
+    State('gamma_r_1', 'value'),
+    State('water-table', 'value'),
+    State('friction_angle', 'value'),
+    State('scenarios', 'data'),
+    prevent_initial_call=True
+)
+def update_scenarios(pin_clicks, clear_clicks, u_r, h, gamma_1, gamma_r_1, water_table, friction_angle, pinned):
+    if dash.ctx.triggered_id == 'clear-pinned-button':
+        return []
+    if None in (u_r, h, gamma_1, gamma_r_1, water_table, friction_angle):
+        raise PreventUpdate
+    scenario = dict(u_r=u_r, h=h, friction_angle=friction_angle, gamma_1=gamma_1,
+                    gamma_r_1=gamma_r_1, water_table=water_table)
+    return scenarios.pin(pinned, scenario)
 
 
+# Callback to overlay the pinned scenarios, only newly pinned ones are computed
+@app.callback(
+    Output('comparison-graph', 'figure'),
+    Output('comparison-container', 'hidden'),
+    Input('scenarios', 'data'),
+    prevent_initial_call=True
+)
+@metrics.instrument('update_comparison')
+def update_comparison(pinned):
+    if not pinned:
+        return dash.no_update, True
+    figure = figures.comparison_figure([scenarios.label(scenario) for scenario in pinned],
+                                       scenarios.cache.get_many(pinned))
+    encoding.encode_figure(figure)
+    return figure, False
+
+
+# Point the design table links at the current inputs in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace='earth_pressure', function_name='export_links'),
+    Output('export-csv', 'href'),
+    Output('export-xlsx', 'href'),
+    Input('u/h', 'value'),
+    Input('gamma_1', 'value'),
+    Input('gamma_r_1', 'value'),
+    Input('water-table', 'value'),
+)
 
 
+def get_figures(u_r, u_r_max, u_r_min, h, gamma_1, gamma_r_1, water_table, friction_angle, family=False):
+    # Serve repeated slider states from the figure cache
+    key = figure_cache.make_key(u_r=u_r, u_r_max=u_r_max, u_r_min=u_r_min, h=h, gamma_1=gamma_1,
+                                gamma_r_1=gamma_r_1, water_table=water_table, friction_angle=friction_angle,
+                                family=family)
+    if key is not None:
+        with metrics.phase('serialization'):
+            cached = figure_cache.cache.get(key)
+        if cached is not None:
+            return cached
+
+    figure_set = figures.build_figures(u_r, u_r_max, u_r_min, h, gamma_1, gamma_r_1, water_table, friction_angle,
+                                       family)
+    with metrics.phase('serialization'):
+        for figure in figure_set:
+            encoding.encode_figure(figure)
+        payload = json.dumps(figure_set, cls=plotly.utils.PlotlyJSONEncoder)
+        if key is not None:
+            figure_cache.cache.put(key, payload)
+        return json.loads(payload)
+
+
+def patch_figures(figure_set, inputs, previous):
+    # Send only the traces that changed since the last update of the graphs
+    if previous is None or any(previous.get(name) != inputs[name] for name in figures.AXIS_INPUTS):
+        return figure_set
+    changed = {name for name, value in inputs.items() if previous.get(name) != value}
+    if not changed:
+        return dash.no_update, dash.no_update, dash.no_update
+    soil_layers_fig, Mohr_circle_fig, profile_fig = figure_set
+
+    soil_patch = dash.no_update
+    names = {trace for name in changed for trace in figures.SOIL_TRACE_INPUTS.get(name, ())}
+    if names:
+        soil_patch = Patch()
+        for index, trace in enumerate(figures.soil_traces(inputs['h'])):
+            if trace in names:
+                soil_patch['data'][index] = soil_layers_fig['data'][index]
+
+    # The axis ranges of the Mohr circles depend on the stresses. With only u/h
+    # changed and the same traces drawn, the at-rest circle stays as it is.
+    mohr_patch = Patch()
+    trace_names = figures.mohr_traces(inputs['u_r'])
+    if (inputs['family'] or not changed <= set(figures.MOHR_TRACE_INPUTS)
+            or figures.mohr_traces(previous.get('u_r')) != trace_names):
+        mohr_patch['data'] = Mohr_circle_fig['data']
+    else:
+        names = {trace for name in changed for trace in figures.MOHR_TRACE_INPUTS[name]}
+        for index, trace in enumerate(trace_names):
+            if trace in names:
+                mohr_patch['data'][index] = Mohr_circle_fig['data'][index]
+    mohr_patch['layout']['xaxis']['range'] = Mohr_circle_fig['layout']['xaxis']['range']
+    mohr_patch['layout']['yaxis']['range'] = Mohr_circle_fig['layout']['yaxis']['range']
+
+    # The pressure profile depends on every input, its depth axis only on h
+    profile_patch = Patch()
+    profile_patch['data'] = profile_fig['data']
+    profile_patch['layout']['annotations'] = profile_fig['layout']['annotations']
+    return soil_patch, mohr_patch, profile_patch
+
+
+# Number of frames of the wall movement animation
+ANIMATION_FRAMES = int(os.environ.get('EARTH_PRESSURE_ANIMATION_FRAMES', 60))
+
+
+def animate_figures(u_r_max, u_r_min, h, gamma_1, gamma_r_1, water_table, friction_angle,
+                    num_frames=ANIMATION_FRAMES):
+    # Figures with frames of the wall moving from the active to the passive limit.
+    # All frames come from one vectorized solver call, the browser plays them without further requests.
+    soil_layers_fig, Mohr_circle_fig, _ = get_figures(u_r_min, u_r_max, u_r_min, h, gamma_1, gamma_r_1,
+                                                      water_table, friction_angle)
+    u_sweep = np.linspace(u_r_min, u_r_max, num_frames)
+    state = solver.solve(u_sweep, h, friction_angle, gamma_1, gamma_r_1, water_table,
+                         u_r_min=u_r_min, u_r_max=u_r_max)
+    x_circle, y_circle = solver.circle_points(*solver.mohr_circle(state['sigma_v0'], state['sigma_h']))
+
+    # Trace coordinates of every frame, in the same way as build_figures
+    s = 0.1*(u_r_min+u_r_max)
+    u = u_sweep[:, np.newaxis]
+    ones = np.ones_like(u)
+    wall_x = np.hstack([-s+u, -s*ones, s*ones, s+u, -s+u])
+    layer_x = np.hstack([s+u, s*ones, 2*u_r_max*ones, 2*u_r_max*ones])
+    movement_x = np.hstack([0*ones, 1.1*u])
+    surface_x = np.hstack([u, 2*u_r_max*ones])
+
+    index = {trace: i for i, trace in enumerate(figures.soil_traces(h))}
+    colors = np.where(u_sweep < 0, 'blue', np.where(u_sweep == 0, 'black', 'green'))
+    names = np.where(u_sweep < 0, 'Active', np.where(u_sweep == 0, 'At Rest', 'Passive'))
+
+    soil_frames = []
+    mohr_frames = []
+    for i in range(num_frames):
+        data = [{'x': wall_x[i]}, {'x': movement_x[i]}, {'x': surface_x[i]}, {'x': surface_x[i]},
+                {'x': u[i], 'y': [state['k'][i]], 'marker': {'color': colors[i]}}]
+        traces = [index['wall'], index['movement'], index['ground'], index['water'], index['k_marker']]
+        if 'layer' in index:
+            data.append({'x': layer_x[i]})
+            traces.append(index['layer'])
+        soil_frames.append({'name': str(i), 'data': data, 'traces': traces})
+        mohr_frames.append({'name': str(i), 'traces': [1], 'data': [
+            {'x': x_circle[i], 'y': y_circle[i], 'line': {'color': colors[i]}, 'name': names[i]}
+        ]})
+    soil_layers_fig['frames'] = soil_frames
+    Mohr_circle_fig['frames'] = mohr_frames
+
+    # Keep the Mohr axes and critical state lines fixed at the extent of the passive end
+    sigma_n = 1.2 * max(float(state['sigma_v0']), float(state['sigma_h'][-1]))
+    shear_stress_max = sigma_n * np.tan(np.radians(friction_angle))
+    Mohr_circle_fig['data'][2].update(x=[0, sigma_n], y=[0, shear_stress_max])
+    Mohr_circle_fig['data'][3].update(x=[0, sigma_n], y=[0, -shear_stress_max])
+    Mohr_circle_fig['layout']['xaxis']['range'] = [0, sigma_n]
+    Mohr_circle_fig['layout']['yaxis']['range'] = [-shear_stress_max, shear_stress_max]
+    for figure in (soil_layers_fig, Mohr_circle_fig):
+        encoding.encode_figure(figure)
     return soil_layers_fig, Mohr_circle_fig
-if __name__ == '__main__':
-    app.run_server(debug=True)
-    
+
 
 # Expose the server
 server = app.server
+
+
+def warm_up():
+    # Prepare everything the first request needs: the curve table, the layout and
+    # dependencies and one render through the callback endpoint. gunicorn.conf.py
+    # calls this in the master, so the forked workers share the result.
+    curve_table.load()
+    client = server.test_client()
+    for path in ('/', '/_dash-layout', '/_dash-dependencies'):
+        client.get(path)
+
+    output = next(key for key in app.callback_map
+                  if 'soil-layers-graph.figure' in key and 'graph-state.data' in key and '@' not in key)
+    u_r_min, u_r_max = (float(limit) for limit in solver.u_limits(30))
+    state = [('u/h', 'value', 0), ('u/h', 'max', u_r_max), ('u/h', 'min', u_r_min), ('h', 'value', 10),
+             ('gamma_1', 'value', 18), ('gamma_r_1', 'value', 19), ('water-table', 'value', 0),
+             ('friction_angle', 'value', 30), ('graph-state', 'data', None), ('mohr-family', 'value', [])]
+    payload = {
+        'output': output,
+        'outputs': [dict(zip(('id', 'property'), item.rsplit('.', 1))) for item in output.strip('.').split('...')],
+        'inputs': [{'id': 'update-button', 'property': 'n_clicks', 'value': 0}],
+        'changedPropIds': [],
+        'state': [{'id': id, 'property': prop, 'value': value} for id, prop, value in state],
+    }
+    response = client.post('/_dash-update-component', json=payload)
+    if response.status_code != 200:
+        raise RuntimeError(f'warm-up render failed with status {response.status_code}')
+
+
+if __name__ == '__main__':
+    app.run_server(debug=True)
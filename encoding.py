@@ -0,0 +1,113 @@
+"""Compact encoding of the figure arrays and compression of the responses.
+
+Plotly.js (>= 2.28, bundled with dash 2.18) reads typed arrays given as
+{'dtype': 'f4', 'bdata': <base64>}, which is much smaller than decimal JSON
+text. The mode is set with environment variables:
+
+- EARTH_PRESSURE_ARRAY_ENCODING: 'json' (default) or 'base64'
+- EARTH_PRESSURE_ARRAY_DIGITS: significant digits the arrays are rounded to (default 6)
+- EARTH_PRESSURE_COMPRESS: '1' (default) to gzip responses for clients that accept it
+
+The bytes before and after encoding and compression are counted in `stats`.
+"""
+import base64
+import gzip
+import json
+import os
+import threading
+
+import numpy as np
+from flask import request
+
+
+ARRAY_ENCODING = os.environ.get('EARTH_PRESSURE_ARRAY_ENCODING', 'json')
+ARRAY_DIGITS = int(os.environ.get('EARTH_PRESSURE_ARRAY_DIGITS', 6))
+COMPRESS = os.environ.get('EARTH_PRESSURE_COMPRESS', '1') == '1'
+
+# Shorter arrays stay plain lists, the encoding would not pay off
+MIN_ARRAY_LENGTH = 16
+# Responses below this size are not compressed
+MIN_COMPRESS_BYTES = 1024
+
+# Trace properties holding data arrays
+ARRAY_KEYS = ('x', 'y')
+
+stats = {
+    'arrays': 0,
+    'array_raw_bytes': 0,
+    'array_encoded_bytes': 0,
+    'responses': 0,
+    'response_raw_bytes': 0,
+    'response_sent_bytes': 0,
+}
+_stats_lock = threading.Lock()
+
+
+def _count(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            stats[name] += value
+
+
+def round_significant(values, digits=ARRAY_DIGITS):
+    """Round values to the given number of significant digits."""
+    values = np.asarray(values, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = np.floor(np.log10(np.abs(values)))
+    scale = 10.0 ** np.where(np.isfinite(magnitude), digits - 1 - magnitude, 0)
+    return np.round(values * scale) / scale
+
+
+def encode_array(values, mode=ARRAY_ENCODING, digits=ARRAY_DIGITS):
+    """Return values as a base64 float32 typed array or as a rounded list."""
+    values = np.asarray(values, dtype=float)
+    if mode == 'base64':
+        data = values.astype('<f4')
+        return {'dtype': 'f4', 'bdata': base64.b64encode(data.tobytes()).decode('ascii')}
+    return round_significant(values, digits).tolist()
+
+
+def _encode_trace(trace, mode, digits):
+    for key in ARRAY_KEYS:
+        values = trace.get(key)
+        if values is None or isinstance(values, dict) or len(values) < MIN_ARRAY_LENGTH:
+            continue
+        values = np.asarray(values)
+        if values.dtype.kind not in 'fiu':
+            continue
+        encoded = encode_array(values, mode, digits)
+        trace[key] = encoded
+        _count(arrays=1,
+               array_raw_bytes=len(json.dumps(values.tolist())),
+               array_encoded_bytes=len(json.dumps(encoded)))
+
+
+def encode_figure(figure, mode=ARRAY_ENCODING, digits=ARRAY_DIGITS):
+    """Encode the data arrays of a figure dict in place and return it."""
+    for trace in figure.get('data', ()):
+        _encode_trace(trace, mode, digits)
+    for frame in figure.get('frames', ()):
+        for trace in frame.get('data', ()):
+            _encode_trace(trace, mode, digits)
+    return figure
+
+
+def register_compression(server, enabled=COMPRESS):
+    """Gzip the responses of the Flask server for clients that accept it."""
+    @server.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code != 200 or 'Content-Encoding' in response.headers):
+            return response
+        data = response.get_data()
+        sent = data
+        accepts_gzip = 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+        if enabled and accepts_gzip and len(data) >= MIN_COMPRESS_BYTES:
+            sent = gzip.compress(data, compresslevel=5)
+            response.set_data(sent)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.headers['Vary'] = 'Accept-Encoding'
+        _count(responses=1, response_raw_bytes=len(data), response_sent_bytes=len(sent))
+        return response
+
+    return compress_response
@@ -0,0 +1,163 @@
+"""Design tables of the earth pressure over ranges of the inputs.
+
+The table has one row per combination of ϕ′, h, u/h, water table and unit
+weights with K_a, K_0, K_p, the mobilized K, σ_v′ and σ_h′ at h/2 and the
+thrust. The rows are evaluated chunk by chunk with sweep.evaluate, i.e. the
+same solver calls as update_graphs, and written as they are computed, so
+tables of any size need the memory of one chunk. EARTH_PRESSURE_EXPORT_MAX_ROWS
+(default 10,000,000) bounds the rows a table may have, which bounds the time
+and disk space a request may take.
+
+CSV is streamed directly. The xlsx workbook is a zip archive of XML parts; it
+is written by hand with zipfile into a temporary file, the worksheet row by row,
+and the file is streamed and removed afterwards.
+"""
+import csv
+import io
+import math
+import os
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+import sweep
+
+
+# Columns of the table: key of sweep.evaluate and header
+COLUMNS = (
+    ('friction_angle', 'ϕ′ (deg)'),
+    ('h', 'h (m)'),
+    ('u_r', 'u/h'),
+    ('water_table', 'Water table (m)'),
+    ('gamma_1', 'γd (kN/m³)'),
+    ('gamma_r_1', 'γsat (kN/m³)'),
+    ('k_a_ult', 'Ka'),
+    ('k_0', 'K0'),
+    ('k_p_ult', 'Kp'),
+    ('k', 'K'),
+    ('sigma_v0', 'σ′v at h/2 (kPa)'),
+    ('sigma_h', 'σ′h at h/2 (kPa)'),
+    ('thrust', 'P (kN/m)'),
+    ('lever_arm', 'Lever arm of P (m)'),
+)
+CHUNK_SIZE = 10_000
+MAX_ROWS = int(os.environ.get('EARTH_PRESSURE_EXPORT_MAX_ROWS', 10_000_000))
+XLSX_MAX_ROWS = 1_048_576
+STREAM_BLOCK = 64 * 1024
+
+
+def table_size(grids):
+    # Python ints, the product of long ranges overflows int64
+    return math.prod(sweep.grid_shape(grids))
+
+
+def table_chunks(grids, chunk_size=CHUNK_SIZE):
+    """Yield the table rows as arrays of shape (rows, len(COLUMNS)), chunk by chunk."""
+    total = table_size(grids)
+    for start in range(0, total, chunk_size):
+        columns = sweep.evaluate(grids, start, min(start + chunk_size, total))
+        yield np.column_stack([columns[key] for key, _ in COLUMNS])
+
+
+def csv_stream(grids):
+    """Yield the CSV text of the table in pieces."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for _, header in COLUMNS])
+    for rows in table_chunks(grids):
+        writer.writerows(rows.tolist())
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Design table" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_END = '</sheetData></worksheet>'
+
+# Column letters of the cell references
+LETTERS = [chr(ord('A') + i) for i in range(len(COLUMNS))]
+
+
+def _xlsx_row(number, values):
+    cells = ''.join(f'<c r="{letter}{number}"><v>{value!r}</v></c>'
+                    for letter, value in zip(LETTERS, values) if np.isfinite(value))
+    return f'<row r="{number}">{cells}</row>'
+
+
+def write_xlsx(path, grids):
+    """Write the table as an xlsx workbook to path."""
+    if table_size(grids) + 1 > XLSX_MAX_ROWS:
+        raise ValueError(f'an xlsx sheet holds at most {XLSX_MAX_ROWS - 1} rows, use CSV')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES)
+        archive.writestr('_rels/.rels', ROOT_RELS)
+        archive.writestr('xl/workbook.xml', WORKBOOK)
+        archive.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            header = ''.join(f'<c r="{letter}1" t="inlineStr"><is><t>{escape(text)}</t></is></c>'
+                             for letter, (_, text) in zip(LETTERS, COLUMNS))
+            sheet.write((SHEET_START + f'<row r="1">{header}</row>').encode())
+            number = 2
+            for rows in table_chunks(grids):
+                lines = []
+                for values in rows.tolist():
+                    lines.append(_xlsx_row(number, values))
+                    number += 1
+                sheet.write(''.join(lines).encode())
+            sheet.write(SHEET_END.encode())
+
+
+def xlsx_stream(grids):
+    """Write the workbook to a temporary file and yield its bytes in blocks."""
+    handle, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    try:
+        write_xlsx(path, grids)
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(STREAM_BLOCK)
+                if not block:
+                    break
+                yield block
+    finally:
+        os.remove(path)
@@ -0,0 +1,105 @@
+"""Bounded LRU cache for the serialized figures of update_graphs.
+
+The inputs come from discrete sliders, so the figures are keyed on the slider
+state quantized to the slider steps. Entries are stored as JSON strings, which
+keeps the memory accounting exact and hands every caller its own copy.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+# Step size of every input of update_graphs, in the callback's argument order
+INPUT_STEPS = {
+    'u_r': 0.00001,
+    'u_r_max': 0.00001,
+    'u_r_min': 0.00001,
+    'h': 2,
+    'gamma_1': 0.01,
+    'gamma_r_1': 0.01,
+    'water_table': 2,
+    'friction_angle': 0.5,
+    'family': 1,
+}
+
+
+def quantize(value, step, tolerance=1e-6):
+    """Return the index of value on the grid of the given step, None if it is off the grid."""
+    if value is None:
+        return None
+    index = round(value / step)
+    if abs(value / step - index) > tolerance:
+        return None
+    return index
+
+
+def make_key(**inputs):
+    """Return the cache key of the update_graphs inputs, None if they cannot be cached."""
+    key = tuple(quantize(inputs[name], step) for name, step in INPUT_STEPS.items())
+    return None if None in key else key
+
+
+class FigureCache:
+    """Thread-safe LRU cache bounded by entry count and total size in bytes."""
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 ** 2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached figures of key as fresh dicts, None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return json.loads(entry[0])
+
+    def put(self, key, payload):
+        """Store the serialized figures of key and evict the least recently used entries."""
+        size = len(payload.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._entries[key] = (payload, size)
+            self.nbytes += size
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.nbytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+cache = FigureCache(
+    max_entries=int(os.environ.get('EARTH_PRESSURE_CACHE_ENTRIES', 256)),
+    max_bytes=int(os.environ.get('EARTH_PRESSURE_CACHE_BYTES', 64 * 1024 ** 2)),
+)
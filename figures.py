@@ -0,0 +1,396 @@
+"""Figure builder of update_graphs emitting plain figure dicts.
+
+The figures are the same as building them with plotly.graph_objs, but the
+static parts of the layout, the axes and the trace styles are prepared once at
+import and only the data arrays are filled in per request. This skips the
+validation of graph_objs, which costs far more than the numerical work.
+"""
+import os
+
+import numpy as np
+import plotly.io as pio
+
+import curve_table
+import metrics
+import pressure_profile
+import solver
+import stratigraphy
+
+
+# Default template that graph_objs adds to every figure
+TEMPLATE = pio.templates[pio.templates.default].to_plotly_json()
+
+# Traces of the soil layers figure in the order of build_figures. The soil layer
+# trace is only drawn for walls with a height and comes first.
+SOIL_TRACES = ('at_rest', 'wall', 'axis', 'movement', 'ground', 'water', 'k_curve', 'k_marker')
+
+# Inputs that change the axes of the figures and require a full rebuild
+AXIS_INPUTS = ('h', 'friction_angle', 'u_r_min', 'u_r_max')
+
+# Traces of the soil layers figure that depend on each of the other inputs
+SOIL_TRACE_INPUTS = {
+    'u_r': ('layer', 'wall', 'movement', 'ground', 'water', 'k_marker'),
+    'water_table': ('water',),
+}
+
+
+def soil_traces(h):
+    """Return the names of the soil figure traces in their order for wall height h."""
+    return (('layer',) if h > 0 else ()) + SOIL_TRACES
+
+
+# Traces of the Mohr circle figure without the circle family that depend on u/h;
+# the at-rest circle does not, every other input changes all of them
+MOHR_TRACE_INPUTS = {
+    'u_r': ('mobilized', 'csl_upper', 'csl_lower'),
+}
+
+
+def mohr_traces(u_r):
+    """Return the names of the Mohr figure traces without the circle family in their order."""
+    return ('at_rest',) + (('mobilized',) if u_r != 0 else ()) + ('csl_upper', 'csl_lower')
+
+
+# Shared axis style, `minor_ticks` and `title_standoff` as graph_objs expands them
+AXIS_STYLE = {
+    'showticklabels': True,
+    'ticks': 'outside',
+    'ticklen': 5,
+    'minor': {'ticks': 'inside'},
+    'showline': True,
+    'linewidth': 2,
+    'linecolor': 'black',
+    'zeroline': False,
+}
+BOLD = {'weight': 'bold'}
+
+SOIL_XAXIS = {**AXIS_STYLE, 'title': {'text': 'u/h', 'font': BOLD, 'standoff': 4}, 'side': 'bottom'}
+SOIL_YAXIS = {**AXIS_STYLE, 'title': {'text': 'h (m)', 'font': BOLD, 'standoff': 4}, 'side': 'right'}
+# The K axis never set showticklabels
+SOIL_YAXIS2 = {**{key: value for key, value in AXIS_STYLE.items() if key != 'showticklabels'},
+               'title': {'text': 'K', 'font': BOLD, 'standoff': 4}, 'overlaying': 'y', 'side': 'left'}
+SOIL_LAYOUT = {
+    'template': TEMPLATE,
+    'plot_bgcolor': 'white',
+    'margin': {'l': 20, 'r': 10},
+}
+
+# Arrows and labels of the active and passive direction
+ARROW = {
+    'ax': 0, 'xref': 'x', 'yref': 'y', 'axref': 'x', 'ayref': 'y',
+    'showarrow': True, 'arrowhead': 2, 'arrowsize': 1, 'arrowwidth': 3,
+}
+LABEL = {'showarrow': False, 'xanchor': 'center', 'yanchor': 'middle'}
+PASSIVE_LABEL = {**LABEL, 'text': 'Passive (compression)', 'font': {'size': 14, 'color': 'green', 'weight': 'bold'}}
+ACTIVE_LABEL = {**LABEL, 'text': 'Active (extension)', 'font': {'size': 14, 'color': 'blue', 'weight': 'bold'}}
+
+MOHR_AXIS_STYLE = {
+    **AXIS_STYLE,
+    'showgrid': False,
+    'gridwidth': 1,
+    'gridcolor': 'lightgrey',
+    'mirror': True,
+}
+MOHR_XAXIS = {**MOHR_AXIS_STYLE, 'title': {'text': 'σ (kPa)', 'font': BOLD, 'standoff': 4}, 'hoverformat': '.2f'}
+MOHR_YAXIS = {**MOHR_AXIS_STYLE, 'title': {'text': '𝜏 (kPa)', 'font': BOLD, 'standoff': 4},
+              'zeroline': True, 'zerolinecolor': 'black', 'hoverformat': '.3f',
+              'scaleanchor': 'x', 'scaleratio': 1}
+MOHR_LAYOUT = {
+    'template': TEMPLATE,
+    'title': {'text': 'Mohr Circle for Effective Stresses at depth = h/2',
+              'x': 0.5, 'xanchor': 'center', 'yanchor': 'top',
+              'font': {'size': 20, 'color': 'red', 'weight': 'bold', 'family': 'Arial', 'style': 'italic'}},
+    'plot_bgcolor': 'white',
+    'legend': {'yanchor': 'top', 'y': 1, 'xanchor': 'right', 'x': 1, 'font': {'size': 10},
+               'bgcolor': 'rgba(255, 255, 255, 0.7)', 'bordercolor': 'black', 'borderwidth': 1},
+    'margin': {'l': 10, 'r': 10},
+}
+
+# Styles of the traces, only the data is added per request
+OUTLINE = {'type': 'scatter', 'mode': 'lines', 'showlegend': False, 'hoverinfo': 'skip'}
+LAYER_TRACE = {**OUTLINE, 'line': {'width': 1, 'color': 'black'}, 'name': 'Soil'}
+AT_REST_TRACE = {**OUTLINE, 'fill': 'none', 'line': {'width': 1, 'color': 'black', 'dash': 'dash'},
+                 'name': 'at rest earth pressure'}
+WALL_TRACE = {**OUTLINE, 'fill': 'toself', 'fillcolor': 'lightgrey', 'line': {'width': 1, 'color': 'black'},
+              'name': 'Retaining Wall'}
+AXIS_TRACE = {**OUTLINE, 'line': {'color': 'black', 'width': 1, 'dash': 'dash'}}
+MOVEMENT_TRACE = {**OUTLINE, 'line': {'color': 'red', 'width': 1, 'dash': 'dash'}}
+GROUND_TRACE = {**OUTLINE, 'line': {'color': 'black', 'width': 2}}
+WATER_TRACE = {**OUTLINE, 'line': {'color': 'blue', 'width': 2, 'dash': 'dot'}}
+K_CURVE_TRACE = {'type': 'scatter', 'yaxis': 'y2', 'mode': 'lines', 'line': {'color': 'red', 'width': 3},
+                 'name': 'K', 'showlegend': False}
+K_MARKER_TRACE = {'type': 'scatter', 'yaxis': 'y2', 'mode': 'markers', 'showlegend': False}
+
+CIRCLE_TRACE = {'type': 'scatter', 'mode': 'lines', 'showlegend': True}
+AT_REST_CIRCLE = {**CIRCLE_TRACE, 'line': {'color': 'red', 'width': 2}, 'name': 'At Rest'}
+ACTIVE_CIRCLE = {**CIRCLE_TRACE, 'line': {'color': 'blue', 'width': 2}, 'name': 'Active'}
+PASSIVE_CIRCLE = {**CIRCLE_TRACE, 'line': {'color': 'green', 'width': 2}, 'name': 'Passive'}
+CSL_TRACE = {'type': 'scatter', 'mode': 'lines', 'line': {'color': 'black', 'width': 2},
+             'name': 'Critical State Line'}
+
+PROFILE_XAXIS = {**MOHR_AXIS_STYLE, 'title': {'text': 'Pressure (kPa)', 'font': BOLD, 'standoff': 4},
+                 'rangemode': 'tozero', 'hoverformat': '.2f'}
+PROFILE_YAXIS = {**MOHR_AXIS_STYLE, 'title': {'text': 'z (m)', 'font': BOLD, 'standoff': 4}, 'hoverformat': '.2f'}
+PROFILE_LAYOUT = {
+    'template': TEMPLATE,
+    'title': {**MOHR_LAYOUT['title'], 'text': 'Lateral Pressure over Depth'},
+    'plot_bgcolor': 'white',
+    'legend': MOHR_LAYOUT['legend'],
+    'margin': {'l': 10, 'r': 10},
+}
+PROFILE_TRACE = {'type': 'scatter', 'mode': 'lines', 'showlegend': True}
+SIGMA_V_PROFILE = {**PROFILE_TRACE, 'line': {'color': 'black', 'width': 1, 'dash': 'dash'}, 'name': 'σ′v'}
+SIGMA_H_PROFILE = {**PROFILE_TRACE, 'line': {'color': 'red', 'width': 2}, 'name': 'σ′h'}
+PORE_PRESSURE_PROFILE = {**PROFILE_TRACE, 'line': {'color': 'blue', 'width': 2, 'dash': 'dot'}, 'name': 'u'}
+TOTAL_PROFILE = {**PROFILE_TRACE, 'line': {'color': 'purple', 'width': 3}, 'name': 'σh = σ′h + u'}
+FAMILY_TRACE = {'type': 'scatter', 'mode': 'lines', 'line': {'color': 'lightgrey', 'width': 1},
+                'hoverinfo': 'skip', 'name': 'Circles over depth'}
+CRITICAL_FAMILY_TRACE = {**FAMILY_TRACE, 'line': {'color': 'orange', 'width': 2}}
+
+# Depths of the Mohr circle family, evenly spaced below the surface
+MOHR_DEPTHS = int(os.environ.get('EARTH_PRESSURE_MOHR_DEPTHS', 25))
+
+THRUST_ARROW = {'xref': 'x', 'yref': 'y', 'axref': 'pixel', 'ayref': 'pixel', 'ax': 60, 'ay': 0,
+                'showarrow': True, 'arrowhead': 2, 'arrowsize': 1, 'arrowwidth': 3, 'arrowcolor': 'purple',
+                'xanchor': 'left', 'font': {'size': 12, 'color': 'purple', 'weight': 'bold'}}
+
+
+def build_figures(u_r, u_r_max, u_r_min, h, gamma_1, gamma_r_1, water_table, friction_angle, family=False):
+    """Return [soil_layers_fig, Mohr_circle_fig, profile_fig] as figure dicts.
+
+    With family the Mohr figure also shows the circles of MOHR_DEPTHS depths.
+    """
+    with metrics.phase('physics'):
+        # u vs k
+        row = curve_table.lookup(friction_angle, u_r_min, u_r_max)
+        if row is None:
+            u_data, k = solver.k_curve(friction_angle, u_r_min, u_r_max)
+        else:
+            u_data, k = row[curve_table.U_DATA], row[curve_table.K]
+        state = solver.solve(u_r, h, friction_angle, gamma_1, gamma_r_1, water_table,
+                             u_r_min=u_r_min, u_r_max=u_r_max)
+        k_p_ult = float(state['k_p_ult'])
+
+        # At-rest and mobilized effective stresses
+        sigma_v_0 = float(state['sigma_v0'])
+        x_circle_0, y_circle_0 = solver.circle_points(*solver.mohr_circle(sigma_v_0, state['sigma_h0']))
+        x_circle, y_circle = solver.circle_points(*solver.mohr_circle(sigma_v_0, state['sigma_h']))
+        # The soil as a stack of layers, K and ϕ′ of every depth from its layer
+        soil = stratigraphy.Stratigraphy.single(h, gamma_1, gamma_r_1, friction_angle)
+        limits = {'u_r_min': u_r_min, 'u_r_max': u_r_max}
+        mohr_family = None
+        if family:
+            depth = np.linspace(0, h, MOHR_DEPTHS + 1)[1:]
+            layer = soil.layer_index(depth)
+            sigma_v = soil.sigma_v(depth, water_table)
+            mohr_family = solver.mohr_family(sigma_v, soil.mobilized_k(u_r, **limits)[layer] * sigma_v,
+                                             soil.friction_angle[layer])
+            mohr_family['depth'] = depth
+
+        # Pressures over the depth for the mobilized K of the layers
+        profile = soil.lateral_profile(u_r, water_table, num=pressure_profile.PROFILE_POINTS, **limits)
+        thrust = soil.resultant(u_r, water_table, **limits)
+
+    with metrics.phase('figures'):
+        return [_soil_layers_figure(u_r, u_r_max, u_r_min, h, water_table, u_data, k, state, k_p_ult),
+                _mohr_circle_figure(u_r, friction_angle, state, sigma_v_0, x_circle_0, y_circle_0,
+                                    x_circle, y_circle, mohr_family),
+                profile_figure(h, profile, thrust)]
+
+
+def _soil_layers_figure(u_r, u_r_max, u_r_min, h, water_table, u_data, k, state, k_p_ult):
+    # Ensure y_top has a default value
+    y_top = -0.1*h
+    s = 0.1*(u_r_min+u_r_max)
+    water_depth = float(solver.water_depth_of(h, water_table))
+
+    soil_data = []
+    # Soil layer as a rectangle-like shape
+    if h > 0:
+        soil_data.append({**LAYER_TRACE, 'x': [s+u_r, s, 2*(u_r_max), 2*(u_r_max)], 'y': [0, h, h, 0]})
+    soil_data += [
+        # at rest earth pressure with dash line
+        {**AT_REST_TRACE, 'x': [-s, -s, s, s, -s], 'y': [0, h, h, 0, 0]},
+        # earth retaining wall
+        {**WALL_TRACE, 'x': [-s+u_r, -s, s, s+u_r, -s+u_r], 'y': [0, h, h, 0, 0]},
+        # line at the 0 axis and y-top dash
+        {**AXIS_TRACE, 'x': [0, 0], 'y': [h, y_top]},
+        # line to show the movement of the wall
+        {**MOVEMENT_TRACE, 'x': [0, ((h-y_top)/h)*u_r], 'y': [h, y_top]},
+        # line at the ground table
+        {**GROUND_TRACE, 'x': [u_r, 2*u_r_max], 'y': [0, 0]},
+        # line for the water table, its height above the base drawn as depth
+        {**WATER_TRACE, 'x': [u_r, 2*u_r_max], 'y': [water_depth, water_depth]},
+        # k vs u in yaxis 2
+        {**K_CURVE_TRACE, 'x': u_data, 'y': k},
+        # scatter point for k_a and k_p
+        {**K_MARKER_TRACE, 'x': [u_r], 'y': [float(state['k'])],
+         'marker': {'color': 'blue' if u_r<0 else 'black' if u_r == 0 else 'green', 'size': 10},
+         'name': 'Active_K' if u_r < 0 else 'K_0(At-rest)' if u_r == 0 else 'Passive_K'},
+    ]
+
+    soil_layers_fig = {
+        'data': soil_data,
+        'layout': {
+            **SOIL_LAYOUT,
+            'xaxis': {**SOIL_XAXIS, 'range': [4*u_r_min, 2*u_r_max]},
+            # inverted for depth
+            'yaxis': {**SOIL_YAXIS, 'range': [h, y_top]},
+            'yaxis2': {**SOIL_YAXIS2, 'range': [0, 1.1*k_p_ult]},
+            'annotations': [
+                {**ARROW, 'x': 0.8*u_r_max, 'y': 0.5*y_top, 'ay': 0.5*y_top, 'arrowcolor': 'green'},
+                {**PASSIVE_LABEL, 'x': 0.5*u_r_max, 'y': 0.8*y_top},
+                {**ARROW, 'x': 3*u_r_min, 'y': 0.5*y_top, 'ay': 0.5*y_top, 'arrowcolor': 'blue'},
+                {**ACTIVE_LABEL, 'x': 2*u_r_min, 'y': 0.8*y_top},
+            ],
+        },
+    }
+
+    return soil_layers_fig
+
+
+def _separated(points, rows):
+    # Points of the selected circles in one array, the circles separated by NaN gaps
+    points = points[rows]
+    return np.hstack([points, np.full((len(points), 1), np.nan)]).ravel()
+
+
+def _mohr_circle_figure(u_r, friction_angle, state, sigma_v_0, x_circle_0, y_circle_0, x_circle, y_circle,
+                        mohr_family=None):
+    mohr_data = [{**AT_REST_CIRCLE, 'x': x_circle_0, 'y': y_circle_0}]
+    sigma_n = 1.2 * sigma_v_0
+
+    if u_r < 0:
+        mohr_data.append({**ACTIVE_CIRCLE, 'x': x_circle, 'y': y_circle})
+    elif u_r > 0:
+        mohr_data.append({**PASSIVE_CIRCLE, 'x': x_circle, 'y': y_circle})
+        sigma_n = 1.2 * float(state['sigma_h'])
+
+    if mohr_family is not None:
+        # All circles of the family as one trace, the ones closest to failure as a second
+        critical = mohr_family['critical']
+        mobilized_angle = float(mohr_family['mobilized_angle'].max())
+        family_trace = {**FAMILY_TRACE, 'x': _separated(mohr_family['x'], ~critical),
+                        'y': _separated(mohr_family['y'], ~critical)}
+        if critical.any():
+            depth = mohr_family['depth'][critical]
+            mohr_data.insert(0, {**CRITICAL_FAMILY_TRACE, 'x': _separated(mohr_family['x'], critical),
+                                 'y': _separated(mohr_family['y'], critical),
+                                 'name': f"ϕ′mob = {mobilized_angle:.1f}° "
+                                         f"at z = {depth.min():.1f}–{depth.max():.1f} m"})
+        else:
+            # One K and ϕ′ over the depth mobilize the same angle at every depth
+            family_trace['name'] = f"{FAMILY_TRACE['name']}, ϕ′mob = {mobilized_angle:.1f}°"
+        mohr_data.insert(0, family_trace)
+        sigma_n = max(sigma_n, 1.2 * float(np.max(mohr_family['center'] + mohr_family['radius'])))
+
+    # Correct critical state line
+    shear_stress_max = sigma_n * np.tan(np.radians(friction_angle))
+    mohr_data += [
+        {**CSL_TRACE, 'x': [0, sigma_n], 'y': [0, shear_stress_max], 'showlegend': True},
+        {**CSL_TRACE, 'x': [0, sigma_n], 'y': [0, -shear_stress_max], 'showlegend': False},
+    ]
+
+    Mohr_circle_fig = {
+        'data': mohr_data,
+        'layout': {
+            **MOHR_LAYOUT,
+            'xaxis': {**MOHR_XAXIS, 'range': [0, sigma_n]},
+            'yaxis': {**MOHR_YAXIS, 'range': [-shear_stress_max, shear_stress_max]},
+        },
+    }
+
+    return Mohr_circle_fig
+
+
+def profile_figure(h, profile, thrust):
+    """Return the figure of the pressure profile with an arrow at the point of action of the thrust."""
+    depth = profile['depth']
+    lever_arm = float(thrust['lever_arm'])
+    total_at_resultant = float(np.interp(h - lever_arm, depth, profile['sigma_h_total'])) if h > 0 else 0
+    return {
+        'data': [
+            {**SIGMA_V_PROFILE, 'x': profile['sigma_v'], 'y': depth},
+            {**SIGMA_H_PROFILE, 'x': profile['sigma_h'], 'y': depth},
+            {**PORE_PRESSURE_PROFILE, 'x': profile['pore_pressure'], 'y': depth},
+            {**TOTAL_PROFILE, 'x': profile['sigma_h_total'], 'y': depth},
+        ],
+        'layout': {
+            **PROFILE_LAYOUT,
+            'xaxis': PROFILE_XAXIS,
+            # inverted for depth
+            'yaxis': {**PROFILE_YAXIS, 'range': [h, 0]},
+            'annotations': [
+                {**THRUST_ARROW, 'x': total_at_resultant, 'y': h - lever_arm,
+                 'text': f"P = {float(thrust['thrust']):.1f} kN/m at {lever_arm:.2f} m"},
+            ],
+        },
+    }
+
+
+# Histograms of the Monte Carlo results side by side, one x axis per quantity
+RELIABILITY_PANELS = (('k', 'K'), ('sigma_h', 'σ′h at h/2 (kPa)'), ('thrust', 'P (kN/m)'))
+RELIABILITY_LAYOUT = {
+    'template': TEMPLATE,
+    'plot_bgcolor': 'white',
+    'showlegend': False,
+    'bargap': 0,
+    'margin': {'l': 30, 'r': 10, 't': 40, 'b': 40},
+    'yaxis': {**AXIS_STYLE, 'title': {'text': 'Samples', 'font': BOLD, 'standoff': 4}},
+}
+HISTOGRAM_TRACE = {'type': 'bar', 'marker': {'color': 'grey', 'line': {'width': 0}}, 'hoverinfo': 'x+y'}
+QUANTILE_LINE = {'type': 'line', 'yref': 'paper', 'y0': 0, 'y1': 1, 'line': {'color': 'red', 'width': 1, 'dash': 'dash'}}
+
+
+def reliability_figure(summary):
+    """Return the histograms of K, σ_h′ and the thrust with their 5 %, 50 % and 95 % quantiles."""
+    data, shapes = [], []
+    layout = {**RELIABILITY_LAYOUT, 'title': {'text': f"Monte Carlo: {summary['samples']:,} of {summary['total']:,}",
+                                              'x': 0.5, 'xanchor': 'center'}}
+    width = 1 / len(RELIABILITY_PANELS)
+    for i, (name, title) in enumerate(RELIABILITY_PANELS):
+        axis = '' if i == 0 else str(i + 1)
+        result = summary['quantities'][name]
+        quantiles = result['quantiles'] if result else {}
+        layout[f'xaxis{axis}'] = {**AXIS_STYLE, 'domain': [i * width + 0.02, (i + 1) * width - 0.02],
+                                  'title': {'text': title, 'font': BOLD, 'standoff': 4}}
+        if i:
+            layout[f'yaxis{axis}'] = {**AXIS_STYLE, 'anchor': f'x{axis}', 'showticklabels': False}
+        if result is None:
+            continue
+        edges = np.asarray(result['histogram']['edges'])
+        data.append({**HISTOGRAM_TRACE, 'x': (edges[:-1] + edges[1:]) / 2, 'width': np.diff(edges),
+                     'y': result['histogram']['counts'], 'xaxis': f'x{axis}', 'yaxis': f'y{axis}'})
+        shapes += [{**QUANTILE_LINE, 'xref': f'x{axis}', 'x0': value, 'x1': value} for value in quantiles.values()]
+    layout['shapes'] = shapes
+    return {'data': data, 'layout': layout}
+
+
+# Pinned scenarios, K-u/h curves on the left and Mohr circles on the right
+SCENARIO_COLORS = ('#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f')
+COMPARISON_LAYOUT = {
+    'template': TEMPLATE,
+    'plot_bgcolor': 'white',
+    'margin': {'l': 30, 'r': 10, 't': 30, 'b': 40},
+    'legend': {**MOHR_LAYOUT['legend'], 'orientation': 'h', 'yanchor': 'top', 'y': -0.2, 'xanchor': 'left', 'x': 0},
+    'xaxis': {**AXIS_STYLE, 'domain': [0, 0.45], 'title': {'text': 'u/h', 'font': BOLD, 'standoff': 4}},
+    'yaxis': {**AXIS_STYLE, 'title': {'text': 'K', 'font': BOLD, 'standoff': 4}},
+    'xaxis2': {**MOHR_XAXIS, 'domain': [0.55, 1], 'anchor': 'y2'},
+    'yaxis2': {**MOHR_YAXIS, 'anchor': 'x2', 'scaleanchor': 'x2'},
+}
+
+
+def comparison_figure(labels, evaluated):
+    """Return the overlay of the evaluated scenarios of scenarios.ScenarioCache with their labels."""
+    data = []
+    for i, (name, scenario) in enumerate(zip(labels, evaluated)):
+        color = SCENARIO_COLORS[i % len(SCENARIO_COLORS)]
+        group = {'legendgroup': str(i), 'name': name, 'line': {'color': color, 'width': 2}}
+        data += [
+            {**group, 'type': 'scatter', 'mode': 'lines', 'x': scenario['u_data'], 'y': scenario['k_data']},
+            {**group, 'type': 'scatter', 'mode': 'markers', 'showlegend': False, 'marker': {'color': color, 'size': 10},
+             'x': [scenario['u_r']], 'y': [scenario['k']]},
+            {**group, 'type': 'scatter', 'mode': 'lines', 'showlegend': False, 'xaxis': 'x2', 'yaxis': 'y2',
+             'x': scenario['x_circle'], 'y': scenario['y_circle']},
+        ]
+    return {'data': data, 'layout': COMPARISON_LAYOUT}
@@ -0,0 +1,31 @@
+"""Gunicorn settings of the production server (see the Procfile).
+
+The app is imported and warmed up once in the master, so the workers fork with
+the layout, the curve table, the plotly templates and the imported libraries
+in memory and share them copy-on-write instead of importing them each.
+
+    gunicorn earth_pressure:server -c gunicorn.conf.py
+
+WEB_CONCURRENCY sets the worker processes and EARTH_PRESSURE_THREADS the
+threads per worker.
+"""
+import gc
+import multiprocessing
+import os
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8050)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('EARTH_PRESSURE_THREADS', 4))
+timeout = int(os.environ.get('EARTH_PRESSURE_TIMEOUT', 60))
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the app was preloaded, before the workers are forked
+    import earth_pressure
+    earth_pressure.warm_up()
+    # Keep the objects created so far out of the garbage collector, which would
+    # otherwise write to their pages in every worker and undo the sharing
+    gc.freeze()
+    server.log.info('earth_pressure warmed up')
@@ -0,0 +1,334 @@
+"""Background jobs for the long-running computations of the app.
+
+Jobs run in a bounded process pool next to the web server, so a Monte Carlo
+run or a parameter sweep never blocks the threads that serve update_graphs.
+Every job has a directory in the job store on disk with
+
+- status.json: state, progress and the latest partial summary of the job
+- cancel: flag file that asks the job to stop at its next progress report
+- result.json: the result once the job is done
+
+so any server worker process can report the progress of a job and cancel it,
+not only the one that submitted it. The pool is created on the first
+submission, i.e. after gunicorn forked its workers, and its processes are
+spawned, so they inherit no threads or sockets of the server, and run at a
+lower priority than the server so that update_graphs stays fast.
+
+Every server process has its own pool, so the number of processes computing
+at the same time is limited across all of them by slot files in the store: a
+job holds a lock on one slot, a sweep on one per process of its own pool,
+and waits queued until enough slots are free. The locks are released by the
+operating system when a process dies. The status records the host and
+process that own a job, and a job whose process is gone is reported failed.
+
+EARTH_PRESSURE_JOB_WORKERS (default 2) sets the number of slots and the size
+of the pools, EARTH_PRESSURE_JOB_MAX_CASES the largest sweep grid and Monte
+Carlo sample count a job may ask for, EARTH_PRESSURE_JOB_DIR the store
+directory and EARTH_PRESSURE_JOB_TTL the age in seconds after which finished
+jobs are removed.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import fcntl
+except ImportError:  # POSIX only, without it the pools are only limited per server process
+    fcntl = None
+
+import numpy as np
+
+import reliability
+import storage
+import sweep
+
+
+JOB_DIR = os.environ.get('EARTH_PRESSURE_JOB_DIR', os.path.join(os.path.dirname(__file__), 'data', 'jobs'))
+WORKERS = int(os.environ.get('EARTH_PRESSURE_JOB_WORKERS', 2))
+MAX_CASES = int(os.environ.get('EARTH_PRESSURE_JOB_MAX_CASES', 10_000_000))
+TTL = float(os.environ.get('EARTH_PRESSURE_JOB_TTL', 24 * 3600))
+
+SLOT_DIR = os.path.join(JOB_DIR, 'slots')
+# Seconds between the attempts of a queued job to get its slots
+SLOT_POLL = 0.5
+HOST = socket.gethostname()
+
+FINISHED = ('done', 'failed', 'cancelled')
+
+
+class Cancelled(Exception):
+    """Raised in a job when it was asked to stop."""
+
+
+class Job:
+    """Handle of a running job in the worker process to report progress."""
+
+    def __init__(self, path):
+        self.path = path
+        self.status = _read_status(path) or {}
+
+    @property
+    def cancelled(self):
+        return os.path.exists(os.path.join(self.path, 'cancel'))
+
+    def update(self, **fields):
+        self.status.update(fields, updated=time.time())
+        _write_json(os.path.join(self.path, 'status.json'), self.status)
+
+    def progress(self, done, total, summary=None):
+        """Report the progress of the job, raises Cancelled when it was cancelled."""
+        self.update(done=done, total=total, summary=summary)
+        if self.cancelled:
+            raise Cancelled()
+
+
+def monte_carlo(params, job):
+    """Run reliability.simulate(**params), the summary of every chunk is the partial result."""
+    summary = None
+    for summary in reliability.simulate(**params):
+        job.progress(summary['samples'], summary['total'], summary=summary)
+    return summary
+
+
+def parameter_sweep(params, job):
+    """Run sweep.run_sweep into the job directory and return the path of the chunks."""
+    out_dir = os.path.join(job.path, 'sweep')
+    chunks = sweep.run_sweep(out_dir, params.get('grids'), chunk_size=params.get('chunk_size', 100_000),
+                             workers=params.get('workers', 1), progress=job.progress,
+                             cancelled=lambda: job.cancelled)
+    if job.cancelled:
+        raise Cancelled()
+    return {'path': out_dir, 'chunks': chunks}
+
+
+# Functions of the job kinds, called as function(params, job) in the worker
+KINDS = {
+    'monte_carlo': monte_carlo,
+    'sweep': parameter_sweep,
+}
+
+
+def _slot_count(kind, params):
+    # Processes a job computes with: a sweep runs a pool of its own
+    return params['workers'] if kind == 'sweep' else 1
+
+
+def _checked_params(kind, params):
+    # Parameters of a job with the number of processes and cases bounded, raises ValueError
+    params = dict(params)
+    try:
+        if kind == 'sweep':
+            params['workers'] = int(params.get('workers', 1))
+            params['chunk_size'] = max(int(params.get('chunk_size', 100_000)), 1)
+            cases = int(np.prod(sweep.grid_shape(sweep.full_grids(params.get('grids')))))
+        else:
+            params['samples'] = int(params.get('samples', 1_000_000))
+            cases = params['samples']
+    except (AttributeError, TypeError, ValueError) as error:
+        raise ValueError(f'invalid {kind} parameters: {error}') from error
+    if kind == 'sweep' and not 1 <= params['workers'] <= WORKERS:
+        raise ValueError(f'a sweep may use 1 to {WORKERS} workers')
+    if not 1 <= cases <= MAX_CASES:
+        raise ValueError(f'a {kind} job may evaluate 1 to {MAX_CASES} cases, not {cases}')
+    if kind == 'monte_carlo':
+        reliability.check_distributions(params.get('distributions'))
+    return params
+
+
+def _acquire_slots(count, job):
+    # Lock count slot files of the store, waiting while they are taken; returns the open files
+    if fcntl is None:
+        return []
+    os.makedirs(SLOT_DIR, exist_ok=True)
+    while True:
+        held = []
+        for slot in range(WORKERS):
+            if len(held) == count:
+                break
+            f = open(os.path.join(SLOT_DIR, f'slot_{slot}'), 'a')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                continue
+            held.append(f)
+        if len(held) == count:
+            return held
+        # Closing the files releases the locks, a job never holds only part of its slots
+        for f in held:
+            f.close()
+        if job.cancelled:
+            raise Cancelled()
+        time.sleep(SLOT_POLL)
+
+
+def _alive(status):
+    # Whether the process that owns an unfinished job still runs; other hosts are not checked
+    pid = status.get('pid', status.get('server_pid'))
+    if pid is None or status.get('host') != HOST or os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _write_json(path, data):
+    with storage.atomic_path(path) as tmp_path, open(tmp_path, 'w') as f:
+        json.dump(data, f)
+
+
+def _read_status(path):
+    try:
+        with open(os.path.join(path, 'status.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _job_path(job_id):
+    # Job ids are uuid4 hex strings, anything else cannot be a job
+    if not isinstance(job_id, str) or len(job_id) != 32 or job_id.strip('0123456789abcdef'):
+        return None
+    return os.path.join(JOB_DIR, job_id)
+
+
+def _execute(path, kind, params):
+    # Runs in the worker process
+    job = Job(path)
+    job.update(pid=os.getpid())
+    try:
+        slots = _acquire_slots(_slot_count(kind, params), job)
+    except Cancelled:
+        job.update(state='cancelled')
+        return
+    try:
+        if job.cancelled:
+            job.update(state='cancelled')
+            return
+        job.update(state='running', started=time.time())
+        try:
+            result = KINDS[kind](params, job)
+        except Cancelled:
+            job.update(state='cancelled')
+            return
+        except Exception as error:
+            job.update(state='failed', error=f'{type(error).__name__}: {error}')
+            return
+        _write_json(os.path.join(path, 'result.json'), result)
+        job.update(state='done')
+    finally:
+        for f in slots:
+            f.close()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _lower_priority():
+    # Job workers yield the CPU to the server processes of the interactive callbacks
+    if hasattr(os, 'nice'):
+        os.nice(10)
+
+
+def _get_pool(broken=None):
+    # One pool per server process, created lazily so that it is never inherited by a fork.
+    # A pool that broke because one of its processes died is replaced.
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid() or _pool is broken:
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_lower_priority)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def prune(ttl=TTL):
+    """Remove the directories of jobs that finished more than ttl seconds ago."""
+    if not os.path.isdir(JOB_DIR):
+        return
+    now = time.time()
+    for job_id in os.listdir(JOB_DIR):
+        path = os.path.join(JOB_DIR, job_id)
+        status = _read_status(path)
+        if status is not None and status.get('state') in FINISHED and now - status.get('updated', now) > ttl:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def submit(kind, params):
+    """Queue a job of the given kind and return its id.
+
+    Raises ValueError for unknown kinds and for sweeps or Monte Carlo runs
+    beyond WORKERS processes or MAX_CASES cases.
+    """
+    if kind not in KINDS:
+        raise ValueError(f'unknown job kind {kind!r}, expected one of {", ".join(KINDS)}')
+    params = _checked_params(kind, params)
+    prune()
+    job_id = uuid.uuid4().hex
+    path = _job_path(job_id)
+    os.makedirs(path)
+    _write_json(os.path.join(path, 'status.json'),
+                {'id': job_id, 'kind': kind, 'state': 'queued', 'done': 0, 'total': None,
+                 'summary': None, 'error': None, 'host': HOST, 'server_pid': os.getpid(),
+                 'created': time.time(), 'updated': time.time()})
+    pool = _get_pool()
+    try:
+        future = pool.submit(_execute, path, kind, params)
+    except BrokenProcessPool:
+        future = _get_pool(broken=pool).submit(_execute, path, kind, params)
+    future.add_done_callback(lambda future: _check_run(path, future))
+    return job_id
+
+
+def _check_run(path, future):
+    # A job whose worker process died, or never started, cannot report that itself
+    error = future.exception()
+    job = _read_status(path)
+    if error is not None and job is not None and job['state'] not in FINISHED:
+        job.update(state='failed', error=f'{type(error).__name__}: {error}', updated=time.time())
+        _write_json(os.path.join(path, 'status.json'), job)
+
+
+def status(job_id):
+    """Return the status dict of a job, or None for unknown jobs.
+
+    Unfinished jobs whose process has exited are marked failed.
+    """
+    path = _job_path(job_id)
+    job = _read_status(path) if path else None
+    if job is not None and job['state'] not in FINISHED and not _alive(job):
+        job.update(state='failed', error='the process of the job exited', updated=time.time())
+        _write_json(os.path.join(path, 'status.json'), job)
+    return job
+
+
+def cancel(job_id):
+    """Ask a job to stop; returns False for unknown jobs."""
+    path = _job_path(job_id)
+    if path is None or not os.path.isdir(path):
+        return False
+    open(os.path.join(path, 'cancel'), 'w').close()
+    return True
+
+
+def result(job_id):
+    """Return the result of a finished job, or None while there is none."""
+    path = _job_path(job_id)
+    try:
+        with open(os.path.join(path, 'result.json')) as f:
+            return json.load(f)
+    except (FileNotFoundError, TypeError):
+        return None
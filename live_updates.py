@@ -0,0 +1,74 @@
+"""Request coalescing for the live slider updates.
+
+While a slider is dragged the browser numbers its update requests per session.
+A request waits a short settle window and is dropped when a newer request of
+the same session arrived in the meantime, so a burst of drag events renders
+only its last state and stale requests queued behind a render return at once.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class Superseded(Exception):
+    """Raised when a newer request of the same session replaced this one."""
+
+
+class Coalescer:
+    """Keeps the newest request number and a render lock per session."""
+
+    def __init__(self, settle=0.01, max_sessions=1024):
+        self.settle = settle
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.rendered = 0
+
+    def _session(self, session):
+        # Returns [newest seq, render lock] of the session, forgetting the oldest sessions
+        with self._lock:
+            state = self._sessions.get(session)
+            if state is None:
+                state = self._sessions[session] = [-1, threading.Lock()]
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session)
+            return state
+
+    def submit(self, session, seq):
+        """Register request seq of session and return the session state."""
+        state = self._session(session)
+        with self._lock:
+            state[0] = max(state[0], seq)
+        return state
+
+    def _drop(self):
+        with self._lock:
+            self.dropped += 1
+        raise Superseded()
+
+    @contextmanager
+    def turn(self, session, seq):
+        """Run the block for the newest request of session, raise Superseded otherwise."""
+        state = self.submit(session, seq)
+        if self.settle:
+            time.sleep(self.settle)
+        if state[0] > seq:
+            self._drop()
+        with state[1]:
+            # A newer request may have arrived while an older one was rendering
+            if state[0] > seq:
+                self._drop()
+            yield
+            with self._lock:
+                self.rendered += 1
+
+    def stats(self):
+        with self._lock:
+            return {'sessions': len(self._sessions), 'rendered': self.rendered, 'dropped': self.dropped}
+
+
+coalescer = Coalescer(settle=float(os.environ.get('EARTH_PRESSURE_LIVE_SETTLE_MS', 10)) / 1000)
@@ -0,0 +1,165 @@
+"""Instrumentation of the callbacks and a Prometheus text /metrics route.
+
+Callbacks wrapped with `instrument` record their calls and wall time; code
+inside them marks phases (physics, figures, serialization) with `phase`. The
+Flask hooks add the total request time and the payload bytes per callback, and
+EARTH_PRESSURE_TIMING_HEADER=1 adds a Server-Timing header to the responses.
+"""
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from dash.exceptions import PreventUpdate
+from flask import Response, g, has_request_context
+
+import encoding
+import figure_cache
+import live_updates
+
+
+TIMING_HEADER = os.environ.get('EARTH_PRESSURE_TIMING_HEADER', '0') == '1'
+
+# Upper bounds of the latency histogram in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+_lock = threading.Lock()
+_local = threading.local()
+_calls = defaultdict(int)
+_errors = defaultdict(int)
+_phase_seconds = defaultdict(float)
+_latency_counts = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+_latency_sum = defaultdict(float)
+_payload_bytes = defaultdict(int)
+_responses = defaultdict(int)
+
+
+def instrument(name):
+    """Decorator recording calls, errors and wall time of the callback name."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            _local.callback = name
+            _local.phases = {}
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except PreventUpdate:
+                raise
+            except Exception:
+                with _lock:
+                    _errors[name] += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                with _lock:
+                    _calls[name] += 1
+                    _phase_seconds[name, 'callback'] += elapsed
+                    for phase_name, seconds in _local.phases.items():
+                        _phase_seconds[name, phase_name] += seconds
+                # Keep the callback of this request for the Flask hooks
+                if has_request_context():
+                    g.metrics_callback = name
+                    g.metrics_phases = dict(_local.phases, callback=elapsed)
+                _local.callback = None
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def phase(name):
+    """Add the wall time of the block to the phase name of the running callback."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases = getattr(_local, 'phases', None)
+        if phases is not None and getattr(_local, 'callback', None):
+            phases[name] = phases.get(name, 0) + time.perf_counter() - start
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+
+
+def _after_request(response):
+    name = g.get('metrics_callback')
+    if name is None:
+        return response
+    elapsed = time.perf_counter() - g.metrics_start
+    size = 0 if response.is_streamed else response.calculate_content_length() or 0
+    bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound), len(LATENCY_BUCKETS))
+    with _lock:
+        _responses[name] += 1
+        _payload_bytes[name] += size
+        _latency_sum[name] += elapsed
+        _latency_counts[name][bucket] += 1
+    if TIMING_HEADER:
+        phases = dict(g.get('metrics_phases', {}), total=elapsed)
+        response.headers['Server-Timing'] = ', '.join(
+            f'{phase_name};dur={seconds * 1000:.2f}' for phase_name, seconds in phases.items())
+    return response
+
+
+def _counter(lines, name, help_text, values, labels):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} counter')
+    for key, value in sorted(values.items()):
+        key = key if isinstance(key, tuple) else (key,)
+        label_text = ','.join(f'{label}="{item}"' for label, item in zip(labels, key))
+        lines.append(f'{name}{{{label_text}}} {value}')
+
+
+def _gauge(lines, name, help_text, value, kind='gauge'):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    lines.append(f'{name} {value}')
+
+
+def render():
+    """Return all metrics in the Prometheus text format."""
+    lines = []
+    with _lock:
+        _counter(lines, 'earth_pressure_callback_calls_total', 'Calls of the callback.',
+                 dict(_calls), ('callback',))
+        _counter(lines, 'earth_pressure_callback_errors_total', 'Callbacks that raised an exception.',
+                 dict(_errors), ('callback',))
+        _counter(lines, 'earth_pressure_callback_phase_seconds_total', 'Wall time spent per callback phase.',
+                 dict(_phase_seconds), ('callback', 'phase'))
+        _counter(lines, 'earth_pressure_response_bytes_total', 'Bytes of the callback responses as sent.',
+                 dict(_payload_bytes), ('callback',))
+
+        lines.append('# HELP earth_pressure_request_seconds Wall time of the callback requests.')
+        lines.append('# TYPE earth_pressure_request_seconds histogram')
+        for name in sorted(_responses):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), _latency_counts[name]):
+                cumulative += count
+                lines.append(f'earth_pressure_request_seconds_bucket{{callback="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'earth_pressure_request_seconds_sum{{callback="{name}"}} {_latency_sum[name]}')
+            lines.append(f'earth_pressure_request_seconds_count{{callback="{name}"}} {_responses[name]}')
+
+    cache = figure_cache.cache.stats()
+    _gauge(lines, 'earth_pressure_figure_cache_hits_total', 'Figure cache hits.', cache['hits'], 'counter')
+    _gauge(lines, 'earth_pressure_figure_cache_misses_total', 'Figure cache misses.', cache['misses'], 'counter')
+    _gauge(lines, 'earth_pressure_figure_cache_evictions_total', 'Figure cache evictions.',
+           cache['evictions'], 'counter')
+    _gauge(lines, 'earth_pressure_figure_cache_entries', 'Entries in the figure cache.', cache['entries'])
+    _gauge(lines, 'earth_pressure_figure_cache_bytes', 'Bytes in the figure cache.', cache['bytes'])
+
+    for name, value in encoding.stats.items():
+        _gauge(lines, f'earth_pressure_encoding_{name}_total', f'Encoding statistic {name}.', value, 'counter')
+
+    live = live_updates.coalescer.stats()
+    _gauge(lines, 'earth_pressure_live_rendered_total', 'Live updates rendered.', live['rendered'], 'counter')
+    _gauge(lines, 'earth_pressure_live_dropped_total', 'Superseded live updates dropped.', live['dropped'], 'counter')
+    return '\n'.join(lines) + '\n'
+
+
+def register(server):
+    """Add the request hooks and the /metrics route to the Flask server."""
+    server.before_request(_before_request)
+    server.after_request(_after_request)
+    server.add_url_rule('/metrics', 'metrics', lambda: Response(render(), mimetype='text/plain; version=0.0.4'))
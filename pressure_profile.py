@@ -0,0 +1,82 @@
+"""Lateral pressure profile over the wall height and its resultant.
+
+The profile evaluates σ_v′(z), σ_h′(z) = K σ_v′(z), the pore pressure u(z) and
+the total horizontal pressure σ_h′(z) + u(z) over the depth for the mobilized
+K. All functions broadcast over the case parameters, the depth points are
+added as the last axis. The resultant is integrated in closed form over the
+piecewise linear profile, so it is exact for any number of plotted points.
+
+These are the one-layer case of stratigraphy.Stratigraphy in closed form, for
+evaluating many cases in one call.
+"""
+import numpy as np
+
+import solver
+
+
+PROFILE_POINTS = 50
+
+
+def lateral_profile(k, h, gamma_1, gamma_r_1, water_table, num=PROFILE_POINTS):
+    """Return a dict of depth, sigma_v, sigma_h, pore_pressure and sigma_h_total arrays of shape (..., num)."""
+    k = np.asarray(k, dtype=float)[..., np.newaxis]
+    h = np.asarray(h, dtype=float)
+    depth = np.linspace(0, h, num, axis=-1)
+    h = h[..., np.newaxis]
+    gamma_1 = np.asarray(gamma_1, dtype=float)[..., np.newaxis]
+    gamma_r_1 = np.asarray(gamma_r_1, dtype=float)[..., np.newaxis]
+    water_table = np.asarray(water_table, dtype=float)[..., np.newaxis]
+
+    sigma_v = solver.sigma_v0(depth, h, gamma_1, gamma_r_1, water_table)
+    pore_pressure = solver.GAMMA_WATER * np.maximum(depth - solver.water_depth_of(h, water_table), 0)
+    sigma_h = k * sigma_v
+    return {
+        'depth': depth,
+        'sigma_v': sigma_v,
+        'sigma_h': sigma_h,
+        'pore_pressure': pore_pressure,
+        'sigma_h_total': sigma_h + pore_pressure,
+    }
+
+
+def _integrals(h, water_depth, dry_weight, submerged_weight):
+    # Integrals of a profile growing with dry_weight above and submerged_weight
+    # below the water depth: returns ∫ p dz and ∫ z p dz over 0..h
+    below = h - water_depth
+    force = dry_weight * water_depth ** 2 / 2 + dry_weight * water_depth * below + submerged_weight * below ** 2 / 2
+    moment = (dry_weight * water_depth ** 3 / 3
+              + dry_weight * water_depth * (h ** 2 - water_depth ** 2) / 2
+              + submerged_weight * (h ** 3 / 3 - water_depth * h ** 2 / 2 + water_depth ** 3 / 6))
+    return force, moment
+
+
+def resultant(k, h, gamma_1, gamma_r_1, water_table):
+    """Return the resultant horizontal forces per metre of wall and their point of action.
+
+    Returns a dict of arrays:
+
+    - thrust_effective, thrust_water, thrust: forces of σ_h′, u and σ_h′ + u in kN/m
+    - moment: moment of the total thrust about the wall base in kNm/m
+    - lever_arm: height of the point of action of the total thrust above the base in m
+    """
+    k = np.asarray(k, dtype=float)
+    h = np.asarray(h, dtype=float)
+    water_depth = np.minimum(solver.water_depth_of(h, water_table), h)
+    gamma_1 = np.asarray(gamma_1, dtype=float)
+    submerged = np.subtract(gamma_r_1, solver.GAMMA_WATER, dtype=float)
+
+    force_v, moment_v = _integrals(h, water_depth, gamma_1, submerged)
+    force_u, moment_u = _integrals(h, water_depth, 0, solver.GAMMA_WATER)
+    thrust_effective = k * force_v
+    thrust = thrust_effective + force_u
+    # Moment about the base from the moment about the surface
+    moment = h * thrust - (k * moment_v + moment_u)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lever_arm = np.where(thrust != 0, moment / thrust, 0)
+    return {
+        'thrust_effective': thrust_effective,
+        'thrust_water': force_u,
+        'thrust': thrust,
+        'moment': moment,
+        'lever_arm': lever_arm,
+    }
@@ -0,0 +1,174 @@
+"""Monte Carlo reliability analysis of the earth pressure.
+
+ϕ′, γ_d, γ_sat and the water table are drawn from distributions instead of the
+fixed slider values, the wall height and movement stay fixed. The samples are
+evaluated with the vectorized solver in chunks of a fixed size, so millions of
+samples need the memory of one chunk. The distributions of K, σ_h′ at h/2 and
+the resultant thrust are accumulated in fine histograms, from which the
+quantiles are interpolated, and a summary is yielded after every chunk.
+
+A distribution is a dict with a type and its parameters:
+
+- {'type': 'fixed', 'value': v}
+- {'type': 'normal', 'mean': m, 'std': s}
+- {'type': 'lognormal', 'mean': m, 'std': s} (mean and std of the variable itself)
+- {'type': 'uniform', 'low': a, 'high': b}
+"""
+import os
+
+import numpy as np
+
+import pressure_profile
+import solver
+
+
+# Random inputs and the quantities whose distributions are summarized
+VARIABLES = ('friction_angle', 'gamma_1', 'gamma_r_1', 'water_table')
+QUANTITIES = ('k', 'sigma_h', 'thrust')
+QUANTILES = (0.05, 0.5, 0.95)
+
+CHUNK_SIZE = int(os.environ.get('EARTH_PRESSURE_MC_CHUNK', 100_000))
+# Bins of the accumulated histograms, merged into DISPLAY_BINS for plotting
+FINE_BINS = 2000
+DISPLAY_BINS = 50
+
+
+def sample(distribution, rng, size):
+    """Return size samples of a distribution dict."""
+    kind = distribution.get('type', 'fixed')
+    if kind == 'fixed':
+        return np.full(size, float(distribution['value']))
+    if kind == 'normal':
+        return rng.normal(distribution['mean'], distribution['std'], size)
+    if kind == 'lognormal':
+        # Parameters of the underlying normal distribution from the mean and std of the variable
+        mean, std = float(distribution['mean']), float(distribution['std'])
+        sigma_squared = np.log1p((std / mean) ** 2)
+        return rng.lognormal(np.log(mean) - sigma_squared / 2, np.sqrt(sigma_squared), size)
+    if kind == 'uniform':
+        return rng.uniform(distribution['low'], distribution['high'], size)
+    raise ValueError(f'unknown distribution type {kind!r}')
+
+
+def check_distributions(distributions):
+    """Raise ValueError unless distributions has a valid distribution of every variable."""
+    if not isinstance(distributions, dict):
+        raise ValueError('distributions must map the variables to distribution dicts')
+    for name in VARIABLES:
+        distribution = distributions.get(name)
+        if not isinstance(distribution, dict):
+            raise ValueError(f'missing the distribution of {name}')
+        kind = distribution.get('type', 'fixed')
+        keys = {'fixed': ('value',), 'normal': ('mean', 'std'), 'lognormal': ('mean', 'std'),
+                'uniform': ('low', 'high')}.get(kind)
+        if keys is None:
+            raise ValueError(f'unknown distribution type {kind!r} of {name}')
+        try:
+            values = {key: float(distribution[key]) for key in keys}
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'the {kind} distribution of {name} needs numbers for {", ".join(keys)}') from None
+        if not all(np.isfinite(value) for value in values.values()):
+            raise ValueError(f'the parameters of the distribution of {name} must be finite')
+        if values.get('std', 0) < 0:
+            raise ValueError(f'the std of {name} must not be negative')
+        if kind == 'lognormal' and values['mean'] <= 0:
+            raise ValueError(f'the lognormal distribution of {name} needs a positive mean')
+        if kind == 'uniform' and values['low'] > values['high']:
+            raise ValueError(f'the uniform distribution of {name} needs low <= high')
+
+
+class Histogram:
+    """Histogram with running moments of the values of all chunks.
+
+    The bin range is taken from the first chunk, widened by half its span on
+    both sides; later values outside of it are counted in the outer bins.
+    """
+
+    def __init__(self, bins=FINE_BINS):
+        self.bins = bins
+        self.edges = None
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.total_squared = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values):
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        if self.edges is None:
+            low, high = float(values.min()), float(values.max())
+            span = (high - low) or abs(high) or 1.0
+            self.edges = np.linspace(low - span / 2, high + span / 2, self.bins + 1)
+        index = np.clip(np.searchsorted(self.edges, values, side='right') - 1, 0, self.bins - 1)
+        self.counts += np.bincount(index, minlength=self.bins)
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_squared += float(np.square(values).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def quantiles(self, q):
+        """Return the quantiles q interpolated linearly within the bins."""
+        cumulative = np.concatenate([[0], np.cumsum(self.counts)])
+        target = np.asarray(q, dtype=float) * self.count
+        i = np.clip(np.searchsorted(cumulative, target, side='left'), 1, self.bins)
+        in_bin = self.counts[i - 1]
+        fraction = np.where(in_bin > 0, (target - cumulative[i - 1]) / np.maximum(in_bin, 1), 0)
+        values = self.edges[i - 1] + fraction * (self.edges[i] - self.edges[i - 1])
+        return np.clip(values, self.min, self.max)
+
+    def summary(self):
+        if not self.count:
+            return None
+        mean = self.total / self.count
+        counts = self.counts.reshape(DISPLAY_BINS, -1).sum(axis=1)
+        edges = self.edges[::self.bins // DISPLAY_BINS]
+        return {
+            'count': self.count,
+            'mean': mean,
+            'std': float(np.sqrt(max(self.total_squared / self.count - mean ** 2, 0))),
+            'min': self.min,
+            'max': self.max,
+            'quantiles': dict(zip((f'p{round(q * 100):02d}' for q in QUANTILES),
+                                  self.quantiles(QUANTILES).tolist())),
+            'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()},
+        }
+
+
+def evaluate(u_r, h, friction_angle, gamma_1, gamma_r_1, water_table):
+    """Return K, σ_h′ at h/2 and the thrust of arrays of sampled inputs."""
+    # Keep the samples in the range where the formulas are defined
+    friction_angle = np.clip(friction_angle, 0.1, 89.9)
+    gamma_r_1 = np.maximum(gamma_r_1, solver.GAMMA_WATER)
+    water_table = np.clip(water_table, 0, h)
+    state = solver.solve(u_r, h, friction_angle, gamma_1, gamma_r_1, water_table)
+    thrust = pressure_profile.resultant(state['k'], h, gamma_1, gamma_r_1, water_table)
+    return {'k': state['k'], 'sigma_h': state['sigma_h'], 'thrust': thrust['thrust']}
+
+
+def simulate(u_r, h, distributions, samples=1_000_000, chunk_size=CHUNK_SIZE, seed=None):
+    """Yield the summary of the samples drawn so far after every chunk.
+
+    distributions maps the names in VARIABLES to distribution dicts. The
+    summary is a dict of the number of samples done, the total and a summary
+    per quantity with its mean, std, extremes, quantiles and histogram.
+    """
+    rng = np.random.default_rng(seed)
+    histograms = {name: Histogram() for name in QUANTITIES}
+    done = 0
+    while done < samples:
+        size = min(chunk_size, samples - done)
+        inputs = {name: sample(distributions[name], rng, size) for name in VARIABLES}
+        values = evaluate(u_r, h, **inputs)
+        for name in QUANTITIES:
+            histograms[name].add(np.broadcast_to(values[name], (size,)))
+        done += size
+        yield {
+            'samples': done,
+            'total': samples,
+            'quantities': {name: histogram.summary() for name, histogram in histograms.items()},
+        }
+
@@ -0,0 +1,77 @@
+"""Comparison of pinned parameter sets.
+
+The K-u/h curve, the K marker and the mobilized Mohr circle of every pinned
+scenario are kept in an LRU cache per scenario. Scenarios missing from the
+cache are evaluated together in one broadcast solver call, so pinning another
+scenario only computes that one.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import solver
+
+
+SCENARIO_KEYS = ('u_r', 'h', 'friction_angle', 'gamma_1', 'gamma_r_1', 'water_table')
+MAX_SCENARIOS = int(os.environ.get('EARTH_PRESSURE_MAX_SCENARIOS', 6))
+
+
+def scenario_key(scenario):
+    return tuple(float(scenario[key]) for key in SCENARIO_KEYS)
+
+
+def label(scenario):
+    return (f"ϕ′={scenario['friction_angle']}°, h={scenario['h']} m, "
+            f"wt={scenario['water_table']} m, u/h={scenario['u_r']}")
+
+
+def evaluate(scenarios):
+    """Return the curve, marker and circle coordinates of the scenarios, evaluated in one pass."""
+    u_r, h, friction_angle, gamma_1, gamma_r_1, water_table = np.array(
+        [scenario_key(scenario) for scenario in scenarios]).T
+    water_table = np.minimum(water_table, h)
+    state = solver.solve(u_r, h, friction_angle, gamma_1, gamma_r_1, water_table)
+    u_data, k_data = solver.k_curve(friction_angle)
+    x_circle, y_circle = solver.circle_points(*solver.mohr_circle(state['sigma_v0'], state['sigma_h']))
+    k = np.broadcast_to(state['k'], u_r.shape)
+    return [{'u_data': u_data[i], 'k_data': k_data[i], 'u_r': u_r[i], 'k': k[i],
+             'x_circle': x_circle[i], 'y_circle': y_circle[i]}
+            for i in range(len(u_r))]
+
+
+class ScenarioCache:
+    """LRU cache of the evaluated scenarios."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, scenarios):
+        """Return the evaluated scenarios in order, computing the missing ones together."""
+        keys = [scenario_key(scenario) for scenario in scenarios]
+        with self._lock:
+            found = {key: self._entries[key] for key in keys if key in self._entries}
+            for key in found:
+                self._entries.move_to_end(key)
+        missing = [scenario for scenario, key in zip(scenarios, keys) if key not in found]
+        if missing:
+            computed = dict(zip((scenario_key(scenario) for scenario in missing), evaluate(missing)))
+            with self._lock:
+                self._entries.update(computed)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+
+cache = ScenarioCache()
+
+
+def pin(scenarios, scenario):
+    """Return the pinned scenarios with scenario added, dropping the oldest beyond MAX_SCENARIOS."""
+    key = scenario_key(scenario)
+    scenarios = [pinned for pinned in scenarios or [] if scenario_key(pinned) != key]
+    return (scenarios + [scenario])[-MAX_SCENARIOS:]
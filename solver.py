@@ -0,0 +1,198 @@
+"""Earth pressure solver core.
+
+All functions broadcast over NumPy arrays, so a single call can evaluate any
+combination of u/h, h, ϕ′, γ_d, γ_sat and water table values without Dash or
+Plotly being involved.
+"""
+import numpy as np
+
+
+GAMMA_WATER = 10  # kN/m³ for water
+
+# Exponents of the mobilization curves towards the active and passive limit
+A_A = 3.5
+A_B = 5
+
+# u/h limits of the active and passive state depending on the friction angle.
+# Friction angles below U_LIMIT_BOUNDS[i] use U_R_MIN[i] / U_R_MAX[i].
+U_LIMIT_BOUNDS = np.array([25, 30, 35, 40])
+U_R_MIN = np.array([-0.008, -0.004, -0.002, -0.0015, -0.0006])
+U_R_MAX = np.array([0.04, 0.02, 0.012, 0.008, 0.004])
+
+# 100 points for a smooth circle
+CIRCLE_POINTS = 100
+
+# Unit circle shared by all Mohr circles of CIRCLE_POINTS points
+_THETA = np.linspace(0, 2 * np.pi, CIRCLE_POINTS)
+UNIT_COS = np.cos(_THETA)
+UNIT_SIN = np.sin(_THETA)
+
+
+def u_limits(friction_angle):
+    """Return (u_r_min, u_r_max), the u/h of the ultimate active and passive state."""
+    idx = np.searchsorted(U_LIMIT_BOUNDS, friction_angle, side='right')
+    return U_R_MIN[idx], U_R_MAX[idx]
+
+
+def earth_pressure_coefficients(friction_angle):
+    """Return (k_0, k_a_ult, k_p_ult) for the effective friction angle in degrees."""
+    sin_phi = np.sin(np.radians(friction_angle))
+    k_0 = 1 - sin_phi
+    k_a_ult = (1 - sin_phi) / (1 + sin_phi)
+    k_p_ult = 1 / k_a_ult
+    return k_0, k_a_ult, k_p_ult
+
+
+def mobilized_k(u_r, friction_angle, u_r_min=None, u_r_max=None, a_a=A_A, a_b=A_B):
+    """Return the mobilized earth pressure coefficient K at the wall movement u/h.
+
+    Negative u/h follows the active curve, positive u/h the passive one and
+    u/h = 0 gives k_0. Missing limits are derived from the friction angle.
+    """
+    if u_r_min is None or u_r_max is None:
+        default_min, default_max = u_limits(friction_angle)
+        u_r_min = default_min if u_r_min is None else u_r_min
+        u_r_max = default_max if u_r_max is None else u_r_max
+    u_r = np.asarray(u_r, dtype=float)
+    k_0, k_a_ult, k_p_ult = earth_pressure_coefficients(friction_angle)
+
+    # Both branches are evaluated everywhere, the unused one may overflow
+    with np.errstate(over='ignore', invalid='ignore'):
+        k_a = k_0 - (k_0 - k_a_ult) * (1 - np.exp(-a_a * u_r / u_r_min))
+        k_p = k_0 + (k_p_ult - k_0) * (1 - np.exp(-a_b * u_r / u_r_max))
+    return np.where(u_r < 0, k_a, k_p)
+
+
+def k_curve(friction_angle, u_r_min=None, u_r_max=None, num=500):
+    """Return (u_data, k) of the K-u/h curve between 2*u_r_min and 2*u_r_max.
+
+    Array inputs give one curve per row, i.e. arrays of shape (..., num).
+    """
+    if u_r_min is None or u_r_max is None:
+        u_r_min, u_r_max = u_limits(friction_angle)
+    friction_angle = np.asarray(friction_angle, dtype=float)
+    u_r_min = np.asarray(u_r_min, dtype=float)
+    u_r_max = np.asarray(u_r_max, dtype=float)
+    u_data = np.linspace(2 * u_r_min, 2 * u_r_max, num, axis=-1)
+    k = mobilized_k(u_data, friction_angle[..., np.newaxis],
+                    u_r_min[..., np.newaxis], u_r_max[..., np.newaxis])
+    return u_data, k
+
+
+def water_depth_of(h, water_table):
+    """Return the depth of the water table below the surface, at least 0."""
+    return np.maximum(np.subtract(h, water_table, dtype=float), 0)
+
+
+def sigma_v0(depth, h, gamma_1, gamma_r_1, water_table):
+    """Return the effective vertical stress at the given depth.
+
+    The stress formula treats the water table as its height above the wall
+    base, so soil below the depth h - water_table is submerged.
+    """
+    water_depth = water_depth_of(h, water_table)
+    dry = np.minimum(depth, water_depth)
+    submerged = np.maximum(np.subtract(depth, water_depth), 0)
+    return gamma_1 * dry + (np.subtract(gamma_r_1, GAMMA_WATER)) * submerged
+
+
+def mohr_circle(sigma_v, sigma_h):
+    """Return (center, half_deviator) of the Mohr circle; the radius is abs(half_deviator)."""
+    return (sigma_v + sigma_h) / 2, (sigma_v - sigma_h) / 2
+
+
+def circle_points(center, half_deviator, num=CIRCLE_POINTS):
+    """Return x and y coordinates of Mohr circles with shape (..., num)."""
+    if num == CIRCLE_POINTS:
+        cos, sin = UNIT_COS, UNIT_SIN
+    else:
+        theta = np.linspace(0, 2 * np.pi, num)
+        cos, sin = np.cos(theta), np.sin(theta)
+    center = np.asarray(center, dtype=float)[..., np.newaxis]
+    half_deviator = np.asarray(half_deviator, dtype=float)[..., np.newaxis]
+    return center + half_deviator * cos, half_deviator * sin
+
+
+def mohr_family(sigma_v, sigma_h, friction_angle, num=CIRCLE_POINTS, tolerance=0.5):
+    """Return the Mohr circles of stresses at many depths and how close they are to failure.
+
+    sigma_v and sigma_h hold the effective stresses of the depths on their last
+    axis; friction_angle broadcasts against them, so layered soils may pass one
+    value per depth. Returns a dict of arrays:
+
+    - center, radius: the circles, x and y: their points with shape (..., depths, num)
+    - mobilized_angle: ϕ′_mob = asin(radius / center) in degrees, the angle of
+      the line from the origin touching the circle
+    - margin: ϕ′ - ϕ′_mob, zero for circles on the critical state line
+    - critical: the depths whose margin is within tolerance degrees of the smallest one;
+      none where the margins of all depths lie within tolerance, e.g. for one
+      K and ϕ′ over the whole depth, as then no depth is closer to failure
+    """
+    center, half_deviator = mohr_circle(np.asarray(sigma_v, dtype=float), np.asarray(sigma_h, dtype=float))
+    radius = np.abs(half_deviator)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(center > 0, radius / center, 0)
+    mobilized_angle = np.degrees(np.arcsin(np.clip(ratio, 0, 1)))
+    margin = np.asarray(friction_angle, dtype=float) - mobilized_angle
+    smallest = margin.min(axis=-1, keepdims=True)
+    varies = margin.max(axis=-1, keepdims=True) - smallest > tolerance
+    critical = (margin <= smallest + tolerance) & varies
+    x, y = circle_points(center, half_deviator, num)
+    return {
+        'center': center,
+        'radius': radius,
+        'x': x,
+        'y': y,
+        'mobilized_angle': mobilized_angle,
+        'margin': margin,
+        'critical': critical,
+    }
+
+
+def solve(u_r, h, friction_angle, gamma_1, gamma_r_1, water_table, depth=None,
+          u_r_min=None, u_r_max=None):
+    """Evaluate the earth pressure state for every broadcast combination of inputs.
+
+    The stresses are evaluated at depth (default h/2, as in the Mohr circle
+    plot). Returns a dict of arrays:
+
+    - k_0, k_a_ult, k_p_ult, u_r_min, u_r_max
+    - k: mobilized K at u/h
+    - state: -1 active, 0 at rest, 1 passive
+    - sigma_v0, sigma_h0, sigma_h: effective stresses in kPa
+    - center_0, radius_0, center, radius: at-rest and mobilized Mohr circles
+    """
+    u_r = np.asarray(u_r, dtype=float)
+    h = np.asarray(h, dtype=float)
+    if depth is None:
+        depth = h / 2
+    if u_r_min is None or u_r_max is None:
+        default_min, default_max = u_limits(friction_angle)
+        u_r_min = default_min if u_r_min is None else u_r_min
+        u_r_max = default_max if u_r_max is None else u_r_max
+
+    k_0, k_a_ult, k_p_ult = earth_pressure_coefficients(friction_angle)
+    k = mobilized_k(u_r, friction_angle, u_r_min, u_r_max)
+
+    sigma_v = sigma_v0(depth, h, gamma_1, gamma_r_1, water_table)
+    sigma_h0 = sigma_v * k_0
+    sigma_h = sigma_v * k
+    center_0, half_deviator_0 = mohr_circle(sigma_v, sigma_h0)
+    center, half_deviator = mohr_circle(sigma_v, sigma_h)
+
+    return {
+        'k_0': k_0,
+        'k_a_ult': k_a_ult,
+        'k_p_ult': k_p_ult,
+        'u_r_min': np.asarray(u_r_min, dtype=float),
+        'u_r_max': np.asarray(u_r_max, dtype=float),
+        'k': k,
+        'state': np.sign(u_r).astype(int),
+        'sigma_v0': sigma_v,
+        'sigma_h0': sigma_h0,
+        'sigma_h': sigma_h,
+        'center_0': center_0,
+        'radius_0': np.abs(half_deviator_0),
+        'center': center,
+        'radius': np.abs(half_deviator),
+    }
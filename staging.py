@@ -0,0 +1,101 @@
+"""Staged excavation histories with incremental recomputation.
+
+A history is a sequence of construction stages, each with the wall height h,
+the water table and the imposed wall movement u/h, in one soil. Every stage is
+evaluated like update_graphs (K, σ_h′ and the Mohr circle at h/2, the thrust)
+and additionally carries the change of the thrust against the previous stage
+and the thrust envelope, the largest thrust of all stages so far.
+
+Stage results are cached under chained keys: the key of a stage is the hash of
+its own inputs and the key of the stage before it. Editing stage i changes
+the keys of i and of every later stage, so exactly these are recomputed, in
+one vectorized solver call, while all earlier stages come from the cache.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import pressure_profile
+import solver
+
+
+STAGE_KEYS = ('h', 'water_table', 'u_r')
+SOIL_KEYS = ('friction_angle', 'gamma_1', 'gamma_r_1')
+RESULT_KEYS = ('k', 'state', 'sigma_v0', 'sigma_h', 'center', 'radius', 'thrust', 'lever_arm',
+               'thrust_change', 'max_thrust')
+
+
+def chain_keys(stages, soil):
+    """Return the chained cache key of every stage."""
+    previous = json.dumps([float(soil[key]) for key in SOIL_KEYS])
+    keys = []
+    for stage in stages:
+        text = json.dumps([previous] + [float(stage[key]) for key in STAGE_KEYS])
+        previous = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+        keys.append(previous)
+    return keys
+
+
+def evaluate_stages(stages, soil, previous=None):
+    """Return the result columns of the stages, continuing after the previous stage result."""
+    h, water_table, u_r = (np.array([float(stage[key]) for stage in stages]) for key in STAGE_KEYS)
+    water_table = np.minimum(water_table, h)
+    friction_angle, gamma_1, gamma_r_1 = (float(soil[key]) for key in SOIL_KEYS)
+    state = solver.solve(u_r, h, friction_angle, gamma_1, gamma_r_1, water_table)
+    thrust = pressure_profile.resultant(state['k'], h, gamma_1, gamma_r_1, water_table)
+
+    shape = h.shape
+    columns = {key: np.broadcast_to(state[key], shape) for key in ('k', 'state', 'sigma_v0', 'sigma_h', 'center')}
+    columns['radius'] = np.abs(np.broadcast_to(state['radius'], shape))
+    columns['thrust'] = np.broadcast_to(thrust['thrust'], shape)
+    columns['lever_arm'] = np.broadcast_to(thrust['lever_arm'], shape)
+    # Quantities that depend on the stages before
+    last_thrust = previous['thrust'] if previous else 0.0
+    last_max = previous['max_thrust'] if previous else -np.inf
+    columns['thrust_change'] = np.diff(columns['thrust'], prepend=last_thrust)
+    columns['max_thrust'] = np.maximum.accumulate(np.maximum(columns['thrust'], last_max))
+    return columns
+
+
+class StageHistory:
+    """LRU cache of stage results under chained keys."""
+
+    def __init__(self, max_entries=100_000):
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.computed = 0
+        self.reused = 0
+
+    def evaluate(self, stages, soil):
+        """Return (results, recomputed): one result dict per stage and the number of stages computed."""
+        keys = chain_keys(stages, soil)
+        with self._lock:
+            results = []
+            for key in keys:
+                result = self._results.get(key)
+                if result is None:
+                    break
+                self._results.move_to_end(key)
+                results.append(result)
+        start = len(results)
+        if start < len(stages):
+            columns = evaluate_stages(stages[start:], soil, results[-1] if results else None)
+            values = {key: columns[key].tolist() for key in RESULT_KEYS}
+            new = [{key: values[key][i] for key in RESULT_KEYS} for i in range(len(stages) - start)]
+            with self._lock:
+                for key, result in zip(keys[start:], new):
+                    self._results[key] = result
+                while len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+            results += new
+        with self._lock:
+            self.reused += start
+            self.computed += len(stages) - start
+        return results, len(stages) - start
+
+
+history = StageHistory()
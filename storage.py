@@ -0,0 +1,25 @@
+"""Files written by one process and read by others.
+
+The curve table, the sweep chunks and the job status files are read by other
+workers while they are written. They are written to a temporary file next to
+the target and moved onto it with os.replace, which is atomic on the same file
+system, so a reader sees either the old or the complete new file.
+"""
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_path(path, suffix=''):
+    """Yield a temporary path to write to; it replaces path when the block succeeds.
+
+    suffix is appended to the temporary name for writers that add an extension
+    themselves, like np.savez adds .npz.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp{suffix}'
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
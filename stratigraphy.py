@@ -0,0 +1,147 @@
+"""Layered soil profiles with their own thickness, unit weights and ϕ′ per layer.
+
+The layers are stored as arrays. The vertical stress is accumulated with a
+cumulative sum over the segments between the layer boundaries and the water
+table, and the layer or segment of any depth is found with a binary search on
+the sorted boundaries, so evaluating thousands of depths in dozens of layers
+needs no Python loop over the layers.
+
+The water table is given as its height above the base of the stack, like the
+water_table of update_graphs and solver.solve; water_table 0 means dry soil.
+
+update_graphs evaluates the soil of its inputs as a stack of one layer, see
+Stratigraphy.single. pressure_profile is the closed form of that one-layer
+stack, broadcast over many cases at once for the sweeps and Monte Carlo runs.
+"""
+import numpy as np
+
+import solver
+
+
+class Stratigraphy:
+    """Stack of soil layers from the surface downwards."""
+
+    def __init__(self, thickness, gamma_d, gamma_sat, friction_angle, names=None):
+        self.thickness = np.asarray(thickness, dtype=float)
+        if self.thickness.ndim != 1 or not len(self.thickness):
+            raise ValueError('thickness must be a non-empty 1D sequence')
+        if np.any(self.thickness <= 0):
+            raise ValueError('every layer needs a positive thickness')
+        shape = self.thickness.shape
+        self.gamma_d = np.broadcast_to(np.asarray(gamma_d, dtype=float), shape)
+        self.gamma_sat = np.broadcast_to(np.asarray(gamma_sat, dtype=float), shape)
+        self.friction_angle = np.broadcast_to(np.asarray(friction_angle, dtype=float), shape)
+        self.names = list(names) if names is not None else [f'Layer {i + 1}' for i in range(len(self))]
+        # Depth of the bottom of every layer and of the top of every layer
+        self.bottom = np.cumsum(self.thickness)
+        self.top = self.bottom - self.thickness
+
+    @classmethod
+    def single(cls, h, gamma_1, gamma_r_1, friction_angle):
+        """Return the one-layer stack of the update_graphs inputs."""
+        return cls([h], [gamma_1], [gamma_r_1], [friction_angle], names=['Soil'])
+
+    @classmethod
+    def from_records(cls, layers):
+        """Return the stack of a list of dicts with thickness, gamma_d, gamma_sat and friction_angle."""
+        return cls([layer['thickness'] for layer in layers],
+                   [layer['gamma_d'] for layer in layers],
+                   [layer['gamma_sat'] for layer in layers],
+                   [layer['friction_angle'] for layer in layers],
+                   names=[layer.get('name', f'Layer {i + 1}') for i, layer in enumerate(layers)])
+
+    def __len__(self):
+        return len(self.thickness)
+
+    @property
+    def height(self):
+        return self.bottom[-1]
+
+    def layer_index(self, depth):
+        """Return the index of the layer at every depth; boundaries belong to the lower layer."""
+        index = np.searchsorted(self.bottom, depth, side='right')
+        return np.minimum(index, len(self) - 1)
+
+    def water_depth(self, water_table):
+        """Return the depth of the water table below the surface for its height above the base."""
+        return float(np.clip(solver.water_depth_of(self.height, water_table), 0, self.height))
+
+    def segments(self, water_table):
+        """Return the segments of the layers split at the water table.
+
+        Returns a dict of the segment tops and bottoms, their layer indices,
+        effective unit weights and the vertical stress at their tops.
+        """
+        water_depth = self.water_depth(water_table)
+        tops = np.union1d(self.top, [water_depth])
+        tops = tops[tops < self.height]
+        bottoms = np.append(tops[1:], self.height)
+        layer = self.layer_index(tops)
+        gamma = np.where(tops >= water_depth, self.gamma_sat[layer] - solver.GAMMA_WATER, self.gamma_d[layer])
+        # Stress at the top of every segment by a cumulative sum over the segments above
+        stress_top = np.concatenate([[0], np.cumsum(gamma * (bottoms - tops))[:-1]])
+        return {'top': tops, 'bottom': bottoms, 'layer': layer, 'gamma': gamma, 'stress_top': stress_top}
+
+    def sigma_v(self, depth, water_table):
+        """Return the effective vertical stress at every depth for the water table at water_table."""
+        segments = self.segments(water_table)
+        segment = np.maximum(np.searchsorted(segments['top'], depth, side='right') - 1, 0)
+        return (segments['stress_top'][segment]
+                + segments['gamma'][segment] * (np.asarray(depth, dtype=float) - segments['top'][segment]))
+
+    def pore_pressure(self, depth, water_table):
+        return solver.GAMMA_WATER * np.maximum(np.asarray(depth, dtype=float) - self.water_depth(water_table), 0)
+
+    def mobilized_k(self, u_r, u_r_min=None, u_r_max=None):
+        """Return the mobilized K of every layer at the wall movement u/h.
+
+        Missing u/h limits are derived from the ϕ′ of every layer.
+        """
+        return solver.mobilized_k(u_r, self.friction_angle, u_r_min, u_r_max)
+
+    def lateral_profile(self, u_r, water_table, depth=None, num=200, u_r_min=None, u_r_max=None):
+        """Return the pressures at the given depths, like pressure_profile.lateral_profile."""
+        if depth is None:
+            depth = np.linspace(0, self.height, num)
+        depth = np.asarray(depth, dtype=float)
+        sigma_v = self.sigma_v(depth, water_table)
+        pore_pressure = self.pore_pressure(depth, water_table)
+        sigma_h = self.mobilized_k(u_r, u_r_min, u_r_max)[self.layer_index(depth)] * sigma_v
+        return {
+            'depth': depth,
+            'layer': self.layer_index(depth),
+            'sigma_v': sigma_v,
+            'sigma_h': sigma_h,
+            'pore_pressure': pore_pressure,
+            'sigma_h_total': sigma_h + pore_pressure,
+        }
+
+    def resultant(self, u_r, water_table, u_r_min=None, u_r_max=None):
+        """Return the thrusts, the moment about the base and the lever arm, like pressure_profile.resultant."""
+        segments = self.segments(water_table)
+        tops, bottoms = segments['top'], segments['bottom']
+        # Every segment has a constant K and linear pressures, evaluate them at both ends
+        k = self.mobilized_k(u_r, u_r_min, u_r_max)[segments['layer']]
+        sigma_v_top = segments['stress_top']
+        sigma_v_bottom = sigma_v_top + segments['gamma'] * (bottoms - tops)
+        effective = _linear_integrals(tops, bottoms, k * sigma_v_top, k * sigma_v_bottom)
+        water = _linear_integrals(tops, bottoms, self.pore_pressure(tops, water_table),
+                                  self.pore_pressure(bottoms, water_table))
+        thrust_effective, thrust_water = effective[0], water[0]
+        thrust = thrust_effective + thrust_water
+        moment = self.height * thrust - (effective[1] + water[1])
+        return {
+            'thrust_effective': thrust_effective,
+            'thrust_water': thrust_water,
+            'thrust': thrust,
+            'moment': moment,
+            'lever_arm': moment / thrust if thrust else 0.0,
+        }
+
+
+def _linear_integrals(z_top, z_bottom, p_top, p_bottom):
+    # ∫ p dz and ∫ z p dz summed over segments with linear p
+    dz = z_bottom - z_top
+    force = np.sum(dz * (p_top + p_bottom) / 2)
+    moment = np.sum(dz * (p_top * (2 * z_top + z_bottom) + p_bottom * (z_top + 2 * z_bottom)) / 6)
+    return force, moment
@@ -0,0 +1,180 @@
+"""Parallel parameter sweeps over the Cartesian product of the wall inputs.
+
+The product of the parameter grids is split into chunks of consecutive flat
+indices. A process pool evaluates the chunks with the vectorized solver and
+every chunk is written to its own .npz file in the output directory, so memory
+stays bounded by the chunks in flight. A manifest records the grids; running
+the same sweep again skips the chunks that already exist, which makes an
+interrupted sweep resumable.
+
+    python sweep.py OUT_DIR --friction-angle 20:50:0.5 --u-r -0.002:0.012:0.0005 \\
+        --h 2:30:2 --water-table 0:30:2 --gamma-1 18 --gamma-r-1 19 --workers 4
+
+Ranges are start:stop:step with stop included, or comma separated values.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+import pressure_profile
+import solver
+import storage
+
+
+# Swept parameters in the order of the product, with their defaults
+PARAMETERS = {
+    'friction_angle': [30],
+    'u_r': [0],
+    'h': [10],
+    'water_table': [0],
+    'gamma_1': [18],
+    'gamma_r_1': [19],
+}
+RESULT_KEYS = ('k', 'k_0', 'k_a_ult', 'k_p_ult', 'sigma_v0', 'sigma_h', 'center', 'radius', 'state')
+THRUST_KEYS = ('thrust', 'lever_arm')
+MANIFEST = 'manifest.json'
+
+
+def parse_range(text, max_count=None):
+    """Return the values of 'start:stop:step' (stop included) or 'a,b,c'.
+
+    A range of more than max_count values raises a ValueError before any of
+    them is allocated.
+    """
+    if ':' in text:
+        start, stop, step = (float(part) for part in text.split(':'))
+        if not all(math.isfinite(value) for value in (start, stop, step)):
+            raise ValueError(f'the range {text} must be finite')
+        count = math.floor((stop - start) / step + 1e-9) + 1
+        if count < 1:
+            raise ValueError(f'the range {text} is empty')
+        if max_count is not None and count > max_count:
+            raise ValueError(f'the range {text} has {count} values, more than {max_count}')
+        return (start + step * np.arange(count)).round(12).tolist()
+    values = [float(part) for part in text.split(',')]
+    if max_count is not None and len(values) > max_count:
+        raise ValueError(f'{len(values)} values are more than {max_count}')
+    return values
+
+
+def grid_shape(grids):
+    return tuple(len(grids[name]) for name in PARAMETERS)
+
+
+def evaluate(grids, start, stop):
+    """Return the input and result columns of the flat product indices start..stop."""
+    index = np.unravel_index(np.arange(start, stop), grid_shape(grids))
+    columns = {name: np.asarray(grids[name], dtype=float)[i] for name, i in zip(PARAMETERS, index)}
+    state = solver.solve(columns['u_r'], columns['h'], columns['friction_angle'], columns['gamma_1'],
+                         columns['gamma_r_1'], columns['water_table'])
+    thrust = pressure_profile.resultant(state['k'], columns['h'], columns['gamma_1'], columns['gamma_r_1'],
+                                        columns['water_table'])
+    shape = (stop - start,)
+    columns.update({key: np.broadcast_to(state[key], shape) for key in RESULT_KEYS})
+    columns.update({key: np.broadcast_to(thrust[key], shape) for key in THRUST_KEYS})
+    return columns
+
+
+def chunk_path(out_dir, chunk):
+    return os.path.join(out_dir, f'chunk_{chunk:06d}.npz')
+
+
+def _run_chunk(grids, out_dir, chunk, chunk_size, total):
+    start = chunk * chunk_size
+    columns = evaluate(grids, start, min(start + chunk_size, total))
+    # An interruption never leaves a partial chunk
+    with storage.atomic_path(chunk_path(out_dir, chunk), suffix='.npz') as tmp_path:
+        np.savez(tmp_path, **columns)
+    return chunk
+
+
+def _write_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)
+        if existing != manifest:
+            raise ValueError(f'{out_dir} holds a different sweep, use another output directory')
+        return
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def full_grids(grids=None):
+    """Return the value lists of every parameter, the ones missing from grids from PARAMETERS."""
+    return {name: [float(value) for value in (grids or {}).get(name, default)]
+            for name, default in PARAMETERS.items()}
+
+
+def run_sweep(out_dir, grids=None, chunk_size=100_000, workers=None, progress=None, cancelled=None):
+    """Run the sweep of grids into out_dir and return the number of chunks.
+
+    grids maps parameter names to value lists, missing ones use PARAMETERS.
+    progress(done, total_chunks) is called after every chunk, and the sweep
+    stops early when cancelled() returns True. Existing chunks are skipped.
+    """
+    grids = full_grids(grids)
+    total = int(np.prod(grid_shape(grids)))
+    chunks = -(-total // chunk_size)
+    os.makedirs(out_dir, exist_ok=True)
+    _write_manifest(out_dir, {'grids': grids, 'chunk_size': chunk_size, 'cases': total, 'chunks': chunks})
+
+    pending = [chunk for chunk in range(chunks) if not os.path.exists(chunk_path(out_dir, chunk))]
+    done = chunks - len(pending)
+    if progress:
+        progress(done, chunks)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Only a few chunks are in flight at a time to keep memory bounded
+        running = set()
+        while pending or running:
+            while pending and len(running) < 2 * workers and not (cancelled and cancelled()):
+                running.add(pool.submit(_run_chunk, grids, out_dir, pending.pop(0), chunk_size, total))
+            if not running:
+                break
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                future.result()
+                done += 1
+                if progress:
+                    progress(done, chunks)
+    return chunks
+
+
+def load_sweep(out_dir):
+    """Yield the column dicts of the finished chunks of a sweep in order."""
+    with open(os.path.join(out_dir, MANIFEST)) as f:
+        chunks = json.load(f)['chunks']
+    for chunk in range(chunks):
+        path = chunk_path(out_dir, chunk)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                yield {key: data[key] for key in data.files}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('out_dir', help='directory of the chunk files, reused to resume a sweep')
+    for name in PARAMETERS:
+        parser.add_argument(f'--{name.replace("_", "-")}', type=parse_range, dest=name,
+                            help=f'values of {name} (default {PARAMETERS[name][0]})')
+    parser.add_argument('--chunk-size', type=int, default=100_000, help='cases per chunk file')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    grids = {name: getattr(args, name) for name in PARAMETERS if getattr(args, name) is not None}
+
+    def progress(done, total):
+        print(f'\r{done}/{total} chunks', end='', file=sys.stderr, flush=True)
+
+    run_sweep(args.out_dir, grids, chunk_size=args.chunk_size, workers=args.workers, progress=progress)
+    print(file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
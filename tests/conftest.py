@@ -0,0 +1,40 @@
+import numbers
+import os
+import sys
+
+import numpy as np
+
+
+# The modules of the app live in the repository root, like for the benchmarks
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _is_numeric_array(values):
+    if isinstance(values, np.ndarray):
+        return values.dtype.kind in 'fiu'
+    return (isinstance(values, (list, tuple)) and len(values) > 0
+            and all(value is None or (isinstance(value, numbers.Number) and not isinstance(value, bool))
+                    for value in values))
+
+
+def assert_equivalent(actual, expected, path='figure'):
+    """Assert that two figure-like structures are equal, numeric arrays compared with np.allclose."""
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict), f'{path}: expected a dict, got {type(actual).__name__}'
+        assert set(actual) == set(expected), f'{path}: differing keys {sorted(set(actual) ^ set(expected))}'
+        for key in expected:
+            assert_equivalent(actual[key], expected[key], f'{path}.{key}')
+    elif _is_numeric_array(expected):
+        assert _is_numeric_array(actual), f'{path}: expected a numeric array, got {actual!r}'
+        actual = np.array([np.nan if value is None else value for value in np.ravel(actual)], dtype=float)
+        expected = np.array([np.nan if value is None else value for value in np.ravel(expected)], dtype=float)
+        assert actual.shape == expected.shape, f'{path}: shapes {actual.shape} != {expected.shape}'
+        assert np.allclose(actual, expected, equal_nan=True), f'{path}: {actual} != {expected}'
+    elif isinstance(expected, (list, tuple)):
+        assert isinstance(actual, (list, tuple)) and len(actual) == len(expected), f'{path}: {actual!r} != {expected!r}'
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            assert_equivalent(a, e, f'{path}[{i}]')
+    elif isinstance(expected, numbers.Number) and not isinstance(expected, bool):
+        assert np.isclose(actual, expected), f'{path}: {actual!r} != {expected!r}'
+    else:
+        assert actual == expected, f'{path}: {actual!r} != {expected!r}'
@@ -0,0 +1,70 @@
+import json
+
+import flask
+import pytest
+
+import api
+import export
+import sweep
+
+
+CASE = dict(u_r=0.001, h=10, friction_angle=30, gamma_1=18, gamma_r_1=19, water_table=4)
+
+
+def lines(cases, chunk_size=api.CHUNK_SIZE):
+    return [json.loads(line) for line in api.stream_results(cases, chunk_size)]
+
+
+def test_stream_results_match_solve_cases():
+    cases = [dict(CASE, u_r=u_r) for u_r in (-0.001, 0, 0.002)]
+    assert lines(cases) == api.solve_cases(cases)
+
+
+@pytest.mark.parametrize('bad', [dict(CASE, h='nan'), dict(CASE, u_r=float('inf')), {'h': 10}, 'case'])
+def test_stream_results_stop_at_the_bad_case(bad):
+    # The bad case sits in the middle of the second chunk
+    cases = [CASE] * 6 + [bad, CASE]
+    results = lines(cases, chunk_size=4)
+    assert len(results) == 7
+    assert results[:6] == api.solve_cases([CASE] * 6)
+    assert results[6]['case'] == 6 and 'error' in results[6]
+
+
+def test_solve_cases_rejects_non_finite_values():
+    with pytest.raises(api.BadCase):
+        api.solve_cases([dict(CASE, friction_angle='nan')])
+
+
+def test_ndjson_lines_report_invalid_json():
+    body = [json.dumps(CASE).encode(), b'{"u_r": ', json.dumps(CASE).encode()]
+    results = lines(api._ndjson_cases(body))
+    assert len(results) == 2
+    assert results[1]['case'] == 1 and results[1]['error'].startswith('invalid JSON line')
+
+
+@pytest.fixture
+def client():
+    app = flask.Flask(__name__)
+    api.register(app)
+    return app.test_client()
+
+
+@pytest.mark.parametrize('table_format', ['csv', 'xlsx'])
+@pytest.mark.parametrize('query', [
+    {'friction_angle': '0:1e10:1'},
+    {'friction_angle': '20:50:0.001', 'h': '1:100:0.01'},
+    {'u_r': '0:1:nan'},
+])
+def test_export_refuses_oversized_tables(client, monkeypatch, query, table_format):
+    monkeypatch.setattr(export, 'MAX_ROWS', 1_000_000)
+    response = client.get('/api/export', query_string=dict(query, format=table_format))
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_parse_range_counts_before_allocating():
+    assert sweep.parse_range('0:1:0.25', max_count=5) == [0, 0.25, 0.5, 0.75, 1]
+    with pytest.raises(ValueError):
+        sweep.parse_range('0:1e10:1', max_count=5)
+    with pytest.raises(ValueError):
+        sweep.parse_range('1,2,3', max_count=2)
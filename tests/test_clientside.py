@@ -0,0 +1,97 @@
+"""Parity of assets/clientside.js with the Python callbacks it mirrors.
+
+The JavaScript functions are run under node, the tests are skipped where node
+is not installed. The constants are compared without node.
+"""
+import json
+import os
+import re
+import shutil
+import subprocess
+from urllib.parse import parse_qs, urlsplit
+
+import plotly
+import pytest
+
+from conftest import assert_equivalent
+import figures
+import solver
+
+
+CLIENTSIDE_JS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'clientside.js')
+
+# Loads clientside.js and prints the results of the calls [[function, args], ...] read from stdin
+NODE_RUNNER = """
+const fs = require('fs');
+const vm = require('vm');
+global.window = {};
+vm.runInThisContext(fs.readFileSync(process.argv[1], 'utf8'));
+const calls = JSON.parse(fs.readFileSync(0, 'utf8'));
+const functions = window.dash_clientside.earth_pressure;
+console.log(JSON.stringify(calls.map(([name, args]) => functions[name](...args))));
+"""
+
+
+def run_js(calls):
+    node = shutil.which('node')
+    if node is None:
+        pytest.skip('node is not installed')
+    payload = json.dumps(calls, cls=plotly.utils.PlotlyJSONEncoder)
+    output = subprocess.run([node, '-e', NODE_RUNNER, CLIENTSIDE_JS], input=payload, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output)
+
+
+def js_constant(name):
+    with open(CLIENTSIDE_JS, encoding='utf-8') as f:
+        source = f.read()
+    return json.loads(re.search(rf'const {name} = ([^;]+);', source).group(1))
+
+
+def test_constants_match_solver():
+    assert js_constant('U_LIMIT_BOUNDS') == solver.U_LIMIT_BOUNDS.tolist()
+    assert js_constant('U_R_MIN') == solver.U_R_MIN.tolist()
+    assert js_constant('U_R_MAX') == solver.U_R_MAX.tolist()
+    assert js_constant('A_A') == solver.A_A
+    assert js_constant('A_B') == solver.A_B
+
+
+def test_trace_offset_matches_soil_traces():
+    # move_wall finds the traces at data.length - 8 and the layer trace at 0
+    with open(CLIENTSIDE_JS, encoding='utf-8') as f:
+        source = f.read()
+    assert f'data.length - {len(figures.SOIL_TRACES)}' in source
+    assert figures.soil_traces(10)[0] == 'layer' and figures.soil_traces(0)[0] == figures.SOIL_TRACES[0]
+
+
+@pytest.mark.parametrize('gamma_r1', [19, 19.0, 19.5, 20.25, 18.37, 10, None])
+@pytest.mark.parametrize('h, friction_angle', [(10, 30), (0, 20), (30, 24.5), (4, 25), (12, 40), (2, 50)])
+def test_update_gamma_prime(gamma_r1, h, friction_angle):
+    import earth_pressure
+    expected = json.loads(json.dumps(earth_pressure.update_gamma_prime(gamma_r1, h, friction_angle)))
+    assert run_js([['update_gamma_prime', [gamma_r1, h, friction_angle]]])[0] == expected
+
+
+@pytest.mark.parametrize('friction_angle', [22, 30, 37.5, 45])
+@pytest.mark.parametrize('h, water_table', [(10, 0), (10, 6), (2, 2), (30, 14)])
+def test_move_wall(friction_angle, h, water_table):
+    u_r_min, u_r_max = (float(limit) for limit in solver.u_limits(friction_angle))
+    inputs = dict(u_r_max=u_r_max, u_r_min=u_r_min, h=h, gamma_1=18, gamma_r_1=19, water_table=water_table,
+                  friction_angle=friction_angle)
+    start = figures.build_figures(u_r=0, **inputs)[0]
+    targets = [u_r_min, 0.3 * u_r_min, 0, 0.4 * u_r_max, u_r_max]
+    moved = run_js([['move_wall', [u_r, u_r_max, u_r_min, h, friction_angle, start]] for u_r in targets])
+    for u_r, figure in zip(targets, moved):
+        expected = json.loads(json.dumps(figures.build_figures(u_r=u_r, **inputs)[0],
+                                         cls=plotly.utils.PlotlyJSONEncoder))
+        # The layout is left as it is, the axes only depend on h and ϕ′
+        assert_equivalent(figure['data'], expected['data'], f'u_r={u_r}')
+
+
+def test_export_links():
+    csv_link, xlsx_link = run_js([['export_links', [0.00123, 18, 19.5, 4]]])[0]
+    for link, table_format in ((csv_link, 'csv'), (xlsx_link, 'xlsx')):
+        url = urlsplit(link)
+        assert url.path == '/api/export'
+        assert parse_qs(url.query) == {'format': [table_format], 'u_r': ['0.00123'], 'gamma_1': ['18'],
+                                       'gamma_r_1': ['19.5'], 'water_table': ['4']}
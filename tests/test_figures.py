@@ -0,0 +1,426 @@
+"""Parity of figures.build_figures with the graph_objs figures it replaced.
+
+baseline_figures is the figure code of update_graphs before the figures were
+built as plain dicts, unchanged apart from the function name and the water
+line, which is now drawn at the depth of the water table below the surface.
+"""
+import itertools
+
+import numpy as np
+import plotly.graph_objs as go
+import pytest
+
+from conftest import assert_equivalent
+import curve_table
+import figures
+import solver
+
+
+def baseline_figures(u_r, u_r_max, u_r_min, h, gamma_1, gamma_r_1, water_table, friction_angle):
+    # Ensure y_top has a default value
+    y_top = -0.1*h
+
+    # Define soil layers and their boundaries with specified patterns
+    layers = [
+        {'layer_id': '2', 'name': 'Soil', 'thickness' : h, 'top': 0, 'bottom': h, 'color': 'rgb(244,164,96)',
+         'fillpattern': {'shape': '.'}, 'x0': 0
+         },  # Dots for Sand
+    ]
+
+    # Create the soil layers figure (139,69,19)
+    soil_layers_fig = go.Figure()
+    Mohr_circle_fig = go.Figure()
+
+    # Add the soil layers to the figure
+
+    for layer in layers:
+        if layer['thickness'] > 0:
+            soil_layers_fig.add_trace(go.Scatter(
+                x=[0.1*(u_r_min+u_r_max)+u_r, 0.1*(u_r_min+u_r_max), 2*(u_r_max), 2*(u_r_max)],  # Create a rectangle-like shape
+                y=[layer['top'], layer['bottom'], layer['bottom'], layer['top']],
+                line=dict(width=1, color='black'),
+                name=layer['name'],
+                showlegend=False,
+                mode='lines',  # Show only the lines, no markers (dots)
+                hoverinfo='skip'
+            ))
+
+    # add at rest earth pressure with dash line
+    soil_layers_fig.add_trace(go.Scatter(
+        x=[-0.1*(u_r_min+u_r_max), -0.1*(u_r_min+u_r_max), 0.1*(u_r_min+u_r_max), 0.1*(u_r_min+u_r_max), -0.1*(u_r_min+u_r_max)],  # Create a rectangle-like shape
+        y=[0, h, h, 0,0],
+        fill='none',
+        line=dict(width=1, color='black', dash='dash'),
+        name='at rest earth pressure',
+        showlegend=False,
+        hoverinfo='skip',  # Skip the hover info for these layers
+        mode='lines'  # Show only the lines, no markers (dots)
+    ))
+
+    # add the earth retaining wall
+    soil_layers_fig.add_trace(go.Scatter(
+        x=[-0.1*(u_r_min+u_r_max)+u_r, -0.1*(u_r_min+u_r_max), 0.1*(u_r_min+u_r_max), 0.1*(u_r_min+u_r_max)+u_r,-0.1*(u_r_min+u_r_max)+u_r],  # Create a rectangle-like shape
+        y=[0, h, h, 0,0],
+        fill='toself',
+        fillcolor='lightgrey',  # Transparent background to see the pattern
+        line=dict(width=1, color='black'),
+        name='Retaining Wall',
+        showlegend=False,
+        hoverinfo='skip',  # Skip the hover info for these layers
+        mode='lines'  # Show only the lines, no markers (dots)
+    ))
+
+    # add a line at the 0 axis and y-top dash
+    soil_layers_fig.add_trace(go.Scatter(
+        x=[0, 0],  # Start at -1 and end at 1
+        y=[h, y_top],  # Horizontal line at the top of the layer
+        mode='lines',
+        line=dict(color='black', width=1, dash='dash'),
+        showlegend=False,  # Hide legend for these lines
+        hoverinfo='skip'  # Skip the hover info for these line
+    ))
+
+    # add a line to show the movement of the wall
+    soil_layers_fig.add_trace(go.Scatter(
+        x=[0, ((h-y_top)/h)*u_r],
+        y=[h, y_top],  # Horizontal line at the top of the layer
+        mode='lines',
+        line=dict(color='red', width=1, dash='dash'),
+        showlegend=False,  # Hide legend for these lines
+        hoverinfo='skip'  # Skip the hover info for these line
+    ))
+
+
+    # add arrow  from to show the direction of passive
+    soil_layers_fig.add_annotation(
+        x=0.8*u_r_max,
+        y=0.5*y_top,
+        ax=0,  # x-coordinate of arrow head
+        ay=0.5*y_top,  # y-coordinate of arrow head
+        xref="x",
+        yref="y",
+        axref="x",
+        ayref="y",
+        showarrow=True,
+        arrowhead=2,
+        arrowsize=1,
+        arrowwidth=3,
+        arrowcolor="green"
+    )
+    # add annotation for the passive
+    soil_layers_fig.add_annotation(
+        x=0.5*u_r_max,  # Position the text slightly to the right of the layer box
+        y=0.8*y_top,
+        text='Passive (compression)',  # Layer name as text
+        font = dict(size=14, color="green", weight='bold'),
+        showarrow=False,  # Don't show an arrow
+        xanchor='center',  # Anchor text to the left
+        yanchor='middle'  # Center text vertically with the midpoint
+    )
+
+    # add arrow  from to show the direction of  active
+    soil_layers_fig.add_annotation(
+        x=3*u_r_min,
+        y=0.5*y_top,
+        ax=0,  # x-coordinate of arrow head
+        ay=0.5*y_top,  # y-coordinate of arrow head
+        xref="x",
+        yref="y",
+        axref="x",
+        ayref="y",
+        showarrow=True,
+        arrowhead=2,
+        arrowsize=1,
+        arrowwidth=3,
+        arrowcolor="blue"
+    )
+    # add annotation for the passive
+    soil_layers_fig.add_annotation(
+        x=2*u_r_min,  # Position the text slightly to the right of the layer box
+        y=0.8*y_top,
+        text='Active (extension)',  # Layer name as text
+        font = dict(size=14, color="blue", weight='bold'),
+        showarrow=False,  # Don't show an arrow
+        xanchor='center',  # Anchor text to the left
+        yanchor='middle'  # Center text vertically with the midpoint
+    )
+
+    # Add a line at the ground table
+    soil_layers_fig.add_trace(go.Scatter(
+        x=[u_r, 2*u_r_max],
+        y=[0, 0],  # Horizontal line at the top of the layer
+        mode='lines',
+        line=dict(color='black', width=2),
+        showlegend=False,  # Hide legend for these lines
+        hoverinfo='skip'  # Skip the hover info for these line
+    ))
+
+
+    # add a line for the water table
+    soil_layers_fig.add_trace(go.Scatter(
+        x=[u_r, 2*u_r_max],  # Start at -1 and end at 1
+        y=[max(h - water_table, 0)] * 2,  # depth of the water table, its height above the base
+        mode='lines',
+        line=dict(color='blue', width=2, dash='dot'),
+        showlegend=False,  # Hide legend for these lines
+        hoverinfo='skip'  # Skip the hover info for these line
+    ))
+
+    # u vs k
+    row = curve_table.lookup(friction_angle, u_r_min, u_r_max)
+    if row is None:
+        u_data, k = solver.k_curve(friction_angle, u_r_min, u_r_max)
+    else:
+        u_data, k = row[curve_table.U_DATA], row[curve_table.K]
+    state = solver.solve(u_r, h, friction_angle, gamma_1, gamma_r_1, water_table,
+                         u_r_min=u_r_min, u_r_max=u_r_max)
+    k_0 = float(state['k_0'])
+    k_p_ult = float(state['k_p_ult'])
+    sigma_n =0
+
+
+
+    # create a trcae for the k vs u in yaxis 2
+    soil_layers_fig.add_trace(go.Scatter(
+        x=u_data,
+        y=k,
+        yaxis='y2',
+        mode='lines',
+        line=dict(color='red', width=3),
+        name='K',
+        showlegend=False
+    ))
+
+    # add a scatter point for k_a and k_p
+    soil_layers_fig.add_trace(go.Scatter(
+        x=[u_r],
+        y=[float(state['k'])],
+        yaxis='y2',
+        mode='markers',
+        marker=dict(color='blue' if u_r<0 else 'black' if u_r == 0 else 'green', size=10),
+        name='Active_K' if u_r < 0 else 'K_0(At-rest)' if u_r == 0 else 'Passive_K',
+        showlegend=False
+    ))
+
+
+
+    # First figure (soil_layers_fig)
+    soil_layers_fig.update_layout(
+        plot_bgcolor='white',
+        xaxis_title= dict(text='u/h', font=dict(weight='bold')),
+        xaxis=dict(
+            range=[4*u_r_min, 2*u_r_max],  # Adjusting the x-range as needed
+            showticklabels=True,
+            ticks='outside',
+            title_standoff=4,
+            ticklen=5,
+            minor_ticks="inside",
+            showline=True,
+            linewidth=2,
+            linecolor='black',
+            zeroline=False,
+            side='bottom'
+        ),
+        yaxis_title= dict(text='h (m)', font=dict(weight='bold')),
+        yaxis=dict(
+            range=[h, y_top],  # Adjusted range for the y-axis (inverted for depth)
+            showticklabels=True,
+            ticks='outside',
+            title_standoff=4,
+            ticklen=5,
+            minor_ticks="inside",
+            showline=True,
+            linewidth=2,
+            linecolor='black',
+            zeroline=False,
+            # scaleanchor="x",  # Link y-axis scaling with x-axis
+            # scaleratio=1,
+            side='right'
+        ),
+        # add another y-axis for k
+        yaxis2=dict(
+            title=dict(text='K', font=dict(weight='bold')),
+            overlaying='y',
+            side='left',
+            range=[0, 1.1*k_p_ult],
+            ticks='outside',
+            title_standoff=4,
+            ticklen=5,
+            minor_ticks="inside",
+            showline=True,
+            linewidth=2,
+            linecolor='black',
+            zeroline=False,
+
+        ),
+
+        margin=dict(l=20, r=10),
+    )
+
+
+
+    # At-rest effective stresses
+    sigma_v_0 = float(state['sigma_v0'])
+    x_circle_0, y_circle_0 = solver.circle_points(*solver.mohr_circle(sigma_v_0, state['sigma_h0']))
+
+    # Add the Mohr circle to the figure
+    Mohr_circle_fig.add_trace(go.Scatter(
+        x=x_circle_0,
+        y=y_circle_0,
+        mode='lines',
+        line=dict(color='red', width=2),
+        name='At Rest',
+        showlegend=True
+    ))
+    sigma_n = 1.2 * sigma_v_0
+
+
+    # mobilized effective stresses
+    x_circle, y_circle = solver.circle_points(*solver.mohr_circle(sigma_v_0, state['sigma_h']))
+    if u_r < 0:
+        # Add the active Mohr circle to the figure
+        Mohr_circle_fig.add_trace(go.Scatter(
+            x=x_circle,
+            y=y_circle,
+            mode='lines',
+            line=dict(color='blue', width=2),
+            name='Active',
+            showlegend=True
+        ))
+    elif u_r > 0:
+        # Add the passive Mohr circle to the figure
+        Mohr_circle_fig.add_trace(go.Scatter(
+            x=x_circle,
+            y=y_circle,
+            mode='lines',
+            line=dict(color='green', width=2),
+            name='Passive',
+            showlegend=True
+        ))
+        sigma_n = 1.2 * float(state['sigma_h'])
+
+
+    # Correct critical state line
+    shear_stress_max = sigma_n * np.tan(np.radians(friction_angle))
+    Mohr_circle_fig.add_trace(go.Scatter(
+        x=[0, sigma_n],  # From origin to max normal stress
+        y=[0, shear_stress_max],  # From cohesion to max shear stress
+        mode='lines',
+        line=dict(color='black', width=2),
+        name='Critical State Line',
+        showlegend=True
+    ))
+
+    Mohr_circle_fig.add_trace(go.Scatter(
+        x=[0, sigma_n],  # From origin to max normal stress
+        y=[0, -shear_stress_max],  # From cohesion to max shear stress
+        mode='lines',
+        line=dict(color='black', width=2),
+        name='Critical State Line',
+        showlegend=False
+    ))
+
+
+
+    Mohr_circle_fig.update_layout(
+        # adding title to the plot at the center top
+        title=dict(text='Mohr Circle for Effective Stresses at depth = h/2',
+                   x=0.5,
+                   xanchor='center',
+                   yanchor='top',
+
+                   font=dict(size=20, color='red', weight='bold', family='Arial', style='italic')
+                   ),
+
+        xaxis_title=dict(text='σ (kPa)', font=dict(weight='bold')),
+        plot_bgcolor='white',
+        xaxis=dict(
+            range=[0, sigma_n],  # Adjusting the x-range as needed
+            title_standoff=4,
+            zeroline=False,
+            showticklabels=True,
+            ticks='outside',
+            ticklen=5,
+            minor_ticks="inside",
+            showline=True,
+            linewidth=2,
+            linecolor='black',
+            showgrid=False,
+            gridwidth=1,
+            gridcolor='lightgrey',
+            mirror=True,
+            hoverformat=".2f"  # Sets hover value format for x-axis to two decimal places
+        ),
+        yaxis_title=dict(text='𝜏 (kPa)', font=dict(weight='bold')),
+        yaxis=dict(
+            range=[-shear_stress_max, shear_stress_max],  # Adjusted range for the y-axis (inverted for depth)
+            zeroline=True,
+            zerolinecolor= "black",
+            title_standoff=4,
+            showticklabels=True,
+            ticks='outside',
+            ticklen=5,
+            minor_ticks="inside",
+            showline=True,
+            linewidth=2,
+            linecolor='black',
+            showgrid=False,
+            gridwidth=1,
+            gridcolor='lightgrey',
+            mirror=True,
+            hoverformat=".3f",  # Sets hover value format for y-axis to two decimal places
+            scaleanchor="x",  # Link y-axis scaling with x-axis
+            scaleratio=1,
+        ),
+        legend=dict(
+            yanchor="top",  # Align the bottom of the legend box
+            y=1,               # Position the legend at the bottom inside the plot
+            xanchor="right",    # Align the right edge of the legend box
+            x=1,               # Position the legend at the right inside the plot
+            font= dict(size=10),  # Adjust font size
+            bgcolor="rgba(255, 255, 255, 0.7)",  # Optional: Semi-transparent white background
+            bordercolor="black",                 # Optional: Border color
+            borderwidth=1                        # Optional: Border width
+        ),
+        margin=dict(l=10, r=10),
+    )
+
+    return [soil_layers_fig, Mohr_circle_fig]
+
+
+# u/h as fractions of the active (negative) and passive (positive) limit
+U_FRACTIONS = (-1, -0.3, 0, 0.4, 1)
+
+
+@pytest.mark.parametrize('friction_angle', [20, 30, 37.5, 50])
+@pytest.mark.parametrize('h, water_table', [(2, 0), (2, 2), (10, 0), (10, 4), (10, 10), (30, 14)])
+def test_build_figures_match_graph_objs(friction_angle, h, water_table):
+    u_r_min, u_r_max = (float(limit) for limit in solver.u_limits(friction_angle))
+    inputs = dict(u_r_max=u_r_max, u_r_min=u_r_min, h=h, gamma_1=18, gamma_r_1=19, water_table=water_table,
+                  friction_angle=friction_angle)
+    for fraction in U_FRACTIONS:
+        u_r = fraction * (u_r_max if fraction > 0 else -u_r_min)
+        expected = [figure.to_plotly_json() for figure in baseline_figures(u_r=u_r, **inputs)]
+        actual = figures.build_figures(u_r=u_r, **inputs)[:2]
+        for name, a, e in zip(('soil_layers_fig', 'Mohr_circle_fig'), actual, expected):
+            assert_equivalent(a, e, f'{name}(u_r={u_r})')
+
+
+def test_soil_traces_follow_build_figures():
+    # The partial updates address the traces by the names of soil_traces
+    for h, u_r in itertools.product((0.5, 10), (-0.001, 0, 0.004)):
+        data = figures.build_figures(u_r, 0.01, -0.002, h, 18, 19, 0, 30)[0]['data']
+        assert len(data) == len(figures.soil_traces(h))
+        index = dict(zip(figures.soil_traces(h), data))
+        assert index['k_marker']['mode'] == 'markers'
+        assert index['wall']['fill'] == 'toself'
+
+
+def test_mohr_traces_follow_build_figures():
+    # The partial updates address the Mohr traces by the names of mohr_traces
+    for u_r in (-0.001, 0, 0.004):
+        data = figures.build_figures(u_r, 0.01, -0.002, 10, 18, 19, 4, 30)[1]['data']
+        index = dict(zip(figures.mohr_traces(u_r), data))
+        assert len(data) == len(index)
+        assert index['at_rest']['name'] == 'At Rest'
+        assert index['csl_upper']['showlegend'] and not index['csl_lower']['showlegend']
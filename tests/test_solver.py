@@ -0,0 +1,18 @@
+import numpy as np
+
+import solver
+
+
+def test_mohr_family_flags_no_depth_for_one_k_and_friction_angle():
+    sigma_v = np.linspace(10, 200, 25)
+    family = solver.mohr_family(sigma_v, 0.4 * sigma_v, 30)
+    assert np.allclose(family['margin'], family['margin'][0])
+    assert not family['critical'].any()
+
+
+def test_mohr_family_flags_the_depths_closest_to_failure():
+    # A weaker layer in the middle of the depths
+    sigma_v = np.linspace(10, 200, 25)
+    friction_angle = np.where((sigma_v > 80) & (sigma_v < 120), 27, 35)
+    family = solver.mohr_family(sigma_v, 0.4 * sigma_v, friction_angle)
+    assert np.array_equal(family['critical'], friction_angle == 27)
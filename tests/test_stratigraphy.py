@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from conftest import assert_equivalent
+import figures
+import pressure_profile
+import solver
+import stratigraphy
+
+
+@pytest.mark.parametrize('u_r', [-0.002, 0, 0.005])
+@pytest.mark.parametrize('h, water_table', [(10, 0), (10, 4), (10, 10), (6, 2.5)])
+def test_one_layer_matches_pressure_profile(u_r, h, water_table):
+    # Same water table convention as update_graphs: its height above the base
+    soil = stratigraphy.Stratigraphy([h], 18, 19, 30)
+    k = soil.mobilized_k(u_r)[0]
+    expected = pressure_profile.lateral_profile(k, h, 18, 19, water_table)
+    profile = soil.lateral_profile(u_r, water_table, depth=expected['depth'])
+    for key in ('sigma_v', 'sigma_h', 'pore_pressure', 'sigma_h_total'):
+        assert np.allclose(profile[key], expected[key]), key
+    thrust = soil.resultant(u_r, water_table)
+    for key, value in pressure_profile.resultant(k, h, 18, 19, water_table).items():
+        assert np.isclose(thrust[key], value), key
+
+
+@pytest.mark.parametrize('u_r', [-0.002, 0, 0.005])
+@pytest.mark.parametrize('h, water_table', [(2, 0), (10, 4), (6, 6)])
+def test_profile_figure_of_update_graphs(u_r, h, water_table):
+    # update_graphs evaluates its inputs as a stack of one layer
+    state = solver.solve(u_r, h, 30, 18, 19, water_table)
+    u_r_min, u_r_max = (float(limit) for limit in solver.u_limits(30))
+    profile = pressure_profile.lateral_profile(state['k'], h, 18, 19, water_table)
+    thrust = pressure_profile.resultant(state['k'], h, 18, 19, water_table)
+    expected = figures.profile_figure(h, profile, thrust)
+    actual = figures.build_figures(u_r, u_r_max, u_r_min, h, 18, 19, water_table, 30)[2]
+    assert_equivalent(actual, expected)